@@ -1,14 +1,21 @@
+import os
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import joblib
-import plotly.express as px
 from pathlib import Path
 
+from core.data import DATA_PATH, dataset_version
+from core.explain import importance_path, load_report
+from core.model import MODEL_PATH, artifact_version, preload
+from core.stats import load_stats
+from core.train import evaluation_path, load_evaluation
+from core.telemetry import cache_miss, debug_panel, span
+
 st.set_page_config(page_title="Diabetes Health Dashboard", page_icon="", layout="wide")
 
 # Header: Image + Title
-header_path = Path("assets/header.png")  # Place a banner image here
+# Banner pre-resized from assets/header.png (840 KB) to a 640px JPEG (~30 KB); see README "Customization"
+header_path = Path("assets/header.jpg")
 col_img, col_title = st.columns([1, 3])
 with col_img:
     if header_path.exists():
@@ -21,50 +28,161 @@ with col_title:
 st.markdown("---")
 st.header(" Dataset Overview & Feature Importance")
 
+@st.cache_resource
+def load_data(version):
+    # Ensure your CSV is located at data/diabetes_dataset.csv or adjust core.data.DATA_PATH.
+    # `version` (the CSV content hash) keys the cache so a new file invalidates it.
+    # The summaries come from one chunked pass (core.stats), not a DataFrame held in memory.
+    cache_miss()
+    return load_stats(DATA_PATH)
+
+@st.cache_data
+def load_importance(report_mtime):
+    # Precomputed by `python -m core.explain`; keyed on the report's mtime so a rebuild is picked up.
+    cache_miss()
+    return load_report(MODEL_PATH)
+
 @st.cache_data
-def load_data():
-    # Ensure your CSV is located here or adjust the path
-    df = pd.read_csv("data/diabetes_dataset.csv")
-    return df
+def load_evaluation_report(report_mtime):
+    # Written by `python -m core.train`; keyed on the report's mtime so a retrain is picked up.
+    cache_miss()
+    return load_evaluation(MODEL_PATH)
 
 @st.cache_resource
-def load_model():
-    try:
-        return joblib.load("models/xgb.pkl")
-    except Exception:
-        return None
+def start_model_preload():
+    # Load and warm up the model once per process so the first Prediction visit does not pay for it.
+    return preload(MODEL_PATH)
 
-df = None
+stats = None
 try:
-    df = load_data()
+    with span("overview.load_stats", cached=True):
+        stats = load_data(dataset_version(DATA_PATH))
 except Exception:
     st.warning("Could not load data from data/diabetes_dataset.csv. Overview will be limited.")
 
 # Overview KPIs and metadata
 st.subheader("Dataset Summary")
-if df is not None:
+if stats is not None:
     k1, k2, k3, k4 = st.columns(4)
-    with k1: st.metric("Rows", f"{len(df):,}")
-    with k2: st.metric("Columns", f"{df.shape[1]}")
+    with k1: st.metric("Rows", f"{stats.n_rows:,}")
+    with k2: st.metric("Columns", f"{len(stats.columns)}")
     with k3: 
         try:
-            st.metric("Diabetes Rate", f"{(df['diagnosed_diabetes'].mean()*100):.1f}%")
+            st.metric("Diabetes Rate", f"{(stats.mean('diagnosed_diabetes')*100):.1f}%")
         except Exception:
             st.metric("Diabetes Rate", "N/A")
     with k4: 
         try:
-            st.metric("Avg Age", f"{df['age'].mean():.1f}")
+            st.metric("Avg Age", f"{stats.mean('age'):.1f}")
         except Exception:
             st.metric("Avg Age", "N/A")
 
     with st.expander("Preview Data", expanded=False):
-        st.dataframe(df.head(10), use_container_width=True)
+        st.dataframe(stats.preview, use_container_width=True)
 
     with st.expander("Schema & Dtypes", expanded=False):
-        dtypes_df = pd.DataFrame({"column": df.columns, "dtype": df.dtypes.astype(str)})
-        st.dataframe(dtypes_df, use_container_width=True)
+        st.dataframe(stats.dtypes_table(), use_container_width=True)
 
     with st.expander("Basic Statistics (Numerical)", expanded=False):
-        st.dataframe(df.select_dtypes(include=[np.number]).describe().T, use_container_width=True)
+        st.dataframe(stats.describe(), use_container_width=True)
 else:
     st.info("Upload data to data/diabetes_dataset.csv for full overview.")
+
+# Feature importance (read from the offline report; no model work happens here)
+st.subheader("Feature Importance")
+report_file = importance_path(MODEL_PATH)
+with span("overview.load_importance", cached=True):
+    report = load_importance(report_file.stat().st_mtime_ns) if report_file.exists() else None
+if report is None:
+    st.info("No importance report yet. Run `python -m core.explain` to compute it for the current model.")
+else:
+    # Plotly Express is only imported once there is a report to draw
+    import plotly.express as px
+
+    try:
+        if report["model_version"] != artifact_version(MODEL_PATH):
+            st.warning("The importance report was built for a different model version; rerun `python -m core.explain`.")
+    except OSError:
+        pass
+    metric_labels = {
+        "mean_abs_shap": "Mean |SHAP| (impact on log-odds)",
+        "total_gain": "Total gain",
+        "gain": "Average gain per split",
+        "cover": "Average cover per split",
+        "weight": "Number of splits (weight)",
+    }
+    c1, c2, c3 = st.columns([2, 2, 1])
+    with c1:
+        metric = st.selectbox("Importance measure", list(metric_labels), format_func=metric_labels.get)
+    with c2:
+        level = st.radio("Level", ["Input features", "Encoded columns"], horizontal=True)
+    with c3:
+        top_n = st.number_input("Top features", 5, 50, 15)
+    table = pd.DataFrame(report["features" if level == "Input features" else "transformed_features"])
+    top = table.nlargest(int(top_n), metric).sort_values(metric)
+    fig = px.bar(
+        top, x=metric, y='feature', orientation='h',
+        title=f'Top {len(top)} Features by {metric_labels[metric]}',
+        labels={metric: metric_labels[metric], 'feature': ''}
+    )
+    fig.update_layout(height=max(350, 28 * len(top)))
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"SHAP summaries computed on {report['n_rows']:,} dataset rows.")
+
+# Model performance (read from the offline cross-validation report; no model work happens here)
+st.subheader("Model Performance")
+evaluation_file = evaluation_path(MODEL_PATH)
+with span("overview.load_evaluation", cached=True):
+    evaluation = load_evaluation_report(evaluation_file.stat().st_mtime_ns) if evaluation_file.exists() else None
+if evaluation is None:
+    st.info("No evaluation report yet. Run `python -m core.train` to cross-validate and retrain the model.")
+else:
+    import plotly.express as px
+
+    try:
+        if evaluation["model_version"] != artifact_version(MODEL_PATH):
+            st.warning("The evaluation report does not describe the current model artifact; rerun `python -m core.train`.")
+    except OSError:
+        pass
+    m = evaluation["metrics"]
+    k1, k2, k3, k4 = st.columns(4)
+    with k1: st.metric("ROC AUC", f"{m['roc_auc']:.3f}", help=f"± {m.get('roc_auc_std', 0):.3f} across folds")
+    with k2: st.metric("Average Precision", f"{m['average_precision']:.3f}")
+    with k3: st.metric("Brier Score", f"{m['brier']:.4f}")
+    with k4: st.metric("CV Folds", f"{evaluation['folds']} × {evaluation['n_rows']:,} rows")
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        fig = px.line(evaluation["roc"], x='fpr', y='tpr', title='ROC Curve (out-of-fold)',
+                      labels={'fpr': 'False positive rate', 'tpr': 'True positive rate'})
+        fig.add_shape(type='line', x0=0, y0=0, x1=1, y1=1, line={'dash': 'dot', 'color': 'gray'})
+        st.plotly_chart(fig, use_container_width=True)
+    with c2:
+        fig = px.line(evaluation["pr"], x='recall', y='precision', title='Precision-Recall Curve',
+                      labels={'recall': 'Recall', 'precision': 'Precision'})
+        fig.add_hline(y=m['prevalence'], line_dash='dot', line_color='gray', annotation_text='Prevalence')
+        st.plotly_chart(fig, use_container_width=True)
+    with c3:
+        fig = px.line(evaluation["calibration"], x='mean_predicted', y='fraction_positive', markers=True,
+                      title='Calibration', labels={'mean_predicted': 'Mean predicted probability',
+                                                   'fraction_positive': 'Observed diabetes rate'})
+        fig.add_shape(type='line', x0=0, y0=0, x1=1, y1=1, line={'dash': 'dot', 'color': 'gray'})
+        st.plotly_chart(fig, use_container_width=True)
+
+    with st.expander("Decision Threshold Table", expanded=False):
+        st.dataframe(pd.DataFrame(evaluation["thresholds"]).round(3), use_container_width=True, hide_index=True)
+
+# The Overview never uses the model: only check that the artifact exists. Deployments that would
+# rather pay for the model here than on the first Prediction visit can set MODEL_PRELOAD=1 to load it
+# in the background once the page has rendered.
+try:
+    artifact_version(MODEL_PATH)
+    model_available = True
+except OSError:
+    model_available = False
+    st.warning(f"No model artifact at {MODEL_PATH}; predictions will not work until one is trained.")
+
+debug_panel()
+
+if model_available and os.environ.get("MODEL_PRELOAD") == "1":
+    start_model_preload()
@@ -0,0 +1,377 @@
+"""Headless benchmark of the dashboard's load, render and inference hot paths.
+
+For each dataset size it generates a synthetic CSV (see benchmarks/synthetic.py)
+in a scratch directory and measures:
+  - load:       raw `pd.read_csv` (the original load_data), the typed parse,
+                building the Parquet cache and loading from it
+  - insights:   each Insights section run headlessly (streamlit AppTest), cold
+                and warm, with per-figure build time, JSON serialization time
+                and payload size
+  - prediction: build_input + single-row scoring latency and batch
+                predict_proba throughput with a stand-in XGBoost pipeline
+  - startup:    each page's first run in a fresh interpreter under
+                `python -X importtime`: modules it imports beyond the
+                Streamlit test harness, their import time per package, and
+                whether a page that needs no model pulls in the model stack
+
+Results are written as JSON; pass --baseline to compare against an earlier run
+and --import-budget-ms to flag pages whose imports exceed a startup budget.
+
+Usage:
+    python -m benchmarks.run --sizes 10k,100k --output bench_results.json
+    python -m benchmarks.run --sizes 10k --baseline old.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import pyarrow.parquet as pq
+
+from benchmarks.synthetic import build_pipeline, write_csv
+from core.schema import EXAMPLE_INPUT, FEATURES, build_input
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+INSIGHTS_PAGE = REPO_ROOT / "pages" / "2_Insights.py"
+INSIGHTS_SECTIONS = [" Demographics & Lifestyle", " Medical History ", " Clinical Measurements"]
+DEFAULT_SIZES = "10k,100k,1M,10M"
+BATCH_SIZES = (1, 100, 1_000, 10_000, 100_000)
+STARTUP_PAGES = ["app.py", "pages/2_Insights.py", "pages/3_Prediction.py", "pages/4_Monitoring.py"]
+# Only these pages load the pipeline, so only they may import scikit-learn/XGBoost on first render.
+MODEL_PAGES = {"pages/3_Prediction.py"}
+MODEL_PACKAGES = ("sklearn", "xgboost", "imblearn", "joblib")
+_FIRST_RUN = (
+    "import json, sys, time\n"
+    "from streamlit.testing.v1 import AppTest\n"
+    "start = time.perf_counter()\n"
+    "at = AppTest.from_file(sys.argv[1], default_timeout=3600).run()\n"
+    "print(json.dumps({'first_run_s': time.perf_counter() - start, 'exceptions': len(at.exception)}))\n"
+)
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "p50_ms": 1000 * statistics.median(samples),
+        "p95_ms": 1000 * samples[min(len(samples) - 1, int(0.95 * len(samples)))],
+        "mean_ms": 1000 * statistics.fmean(samples),
+        "n": len(samples),
+    }
+
+
+@contextmanager
+def _chdir(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def bench_load(csv_path):
+    from core import data
+    from core.stats import compute_stats
+
+    # Each full frame is dropped as soon as it has been measured, so at most one copy of the dataset is held.
+    raw, raw_s = _timed(pd.read_csv, csv_path)
+    memory_raw_mb = raw.memory_usage(deep=True).sum() / 1e6
+    del raw
+    typed_s = _timed(data.read_csv, csv_path)[1]
+    version, version_s = _timed(data.dataset_version, csv_path)
+    build_s = _timed(data.build_cache, csv_path, version)[1]
+    cached, cache_load_s = _timed(data.load_dataset, csv_path)
+    memory_cached_mb = cached.memory_usage(deep=True).sum() / 1e6
+    del cached
+    stats_s = _timed(compute_stats, csv_path, version=version)[1]
+    return {
+        "csv_bytes": Path(csv_path).stat().st_size,
+        "read_csv_s": raw_s,
+        "read_csv_typed_s": typed_s,
+        "hash_s": version_s,
+        "build_cache_s": build_s,
+        "cache_load_s": cache_load_s,
+        "stats_s": stats_s,
+        "memory_raw_mb": memory_raw_mb,
+        "memory_cached_mb": memory_cached_mb,
+    }
+
+
+class _ChartRecorder:
+    # Wraps st.plotly_chart: the time since the previous chart is that chart's build time
+    # (the first one also includes loading the data); serialization is timed separately.
+    def __init__(self, original):
+        self.original = original
+        self.records = []
+        self.mark = time.perf_counter()
+
+    def __call__(self, fig, *args, **kwargs):
+        build_s = time.perf_counter() - self.mark
+        payload, serialize_s = _timed(fig.to_json)
+        self.records.append({
+            "title": fig.layout.title.text,
+            "build_s": build_s,
+            "serialize_s": serialize_s,
+            "json_bytes": len(payload),
+        })
+        result = self.original(fig, *args, **kwargs)
+        self.mark = time.perf_counter()
+        return result
+
+
+def _run_section(section):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    recorder = _ChartRecorder(st.plotly_chart)
+    st.plotly_chart = recorder
+    try:
+        at = AppTest.from_file(str(INSIGHTS_PAGE), default_timeout=3600)
+        at.session_state["insights_section"] = section
+        _, total_s = _timed(at.run)
+    finally:
+        st.plotly_chart = recorder.original
+    if at.exception:
+        raise RuntimeError(f"Insights section {section!r} failed: {at.exception[0].value}")
+    return total_s, recorder.records
+
+
+def bench_insights(workdir):
+    import streamlit as st
+
+    from core.data import CACHE_DIR
+
+    results = {}
+    with _chdir(workdir):
+        for section in INSIGHTS_SECTIONS:
+            # Cold: no in-process caches and no statistics pickled to disk by the previous section.
+            st.cache_data.clear()
+            st.cache_resource.clear()
+            for stale in CACHE_DIR.glob("*.stats.pkl"):
+                stale.unlink()
+            cold_s, figures = _run_section(section)
+            warm_s, _ = _run_section(section)
+            results[section.strip()] = {
+                "cold_s": cold_s,
+                "warm_s": warm_s,
+                "n_figures": len(figures),
+                "json_bytes": sum(f["json_bytes"] for f in figures),
+                "figures": figures,
+            }
+    return results
+
+
+def bench_prediction(model, df, repeat=200, batch_sizes=BATCH_SIZES):
+    from core.scoring import predict, predict_one
+
+    build_samples, single_samples = [], []
+    for _ in range(repeat):
+        X, build_s = _timed(build_input, EXAMPLE_INPUT)
+        _, predict_s = _timed(predict_one, model, X)
+        build_samples.append(build_s)
+        single_samples.append(predict_s)
+
+    X_all = df[FEATURES]
+    batches = {}
+    for size in batch_sizes:
+        if size > len(X_all):
+            break
+        X = X_all.iloc[:size]
+        runs = [_timed(predict, model, X)[1] for _ in range(max(1, min(20, 100_000 // size)))]
+        best = min(runs)
+        batches[str(size)] = {"latency_s": best, "rows_per_s": size / best}
+    return {
+        "build_input": _summary(build_samples),
+        "single_row_predict": _summary(single_samples),
+        "single_row_rows_per_s": 1 / statistics.median(single_samples),
+        "batch": batches,
+    }
+
+
+def _import_times(stderr):
+    # {module: self import time in microseconds} from `python -X importtime` output.
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            modules[name.strip()] = int(self_us)
+    return modules
+
+
+def _first_run(page, workdir):
+    # Measure the configuration that ships: the opt-in Overview model warm-up stays off.
+    env = {k: v for k, v in os.environ.items() if k != "MODEL_PRELOAD"}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", _FIRST_RUN, str(page)], cwd=workdir, env=env,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), _import_times(proc.stderr)
+
+
+def bench_startup(workdir, pages=STARTUP_PAGES):
+    """Import cost of each page's first run in a fresh interpreter, beyond an empty page's."""
+    assets = Path(workdir) / "assets"
+    if not assets.exists():
+        assets.symlink_to(REPO_ROOT / "assets", target_is_directory=True)
+    empty = Path(workdir) / "empty_page.py"
+    empty.write_text("")
+    harness, harness_modules = _first_run(empty, workdir)
+    results = {"harness": {"first_run_s": harness["first_run_s"], "modules": len(harness_modules)}}
+    for page in pages:
+        run, modules = _first_run(REPO_ROOT / page, workdir)
+        if run["exceptions"]:
+            raise RuntimeError(f"{page} raised on its first run")
+        added = {name: us for name, us in modules.items() if name not in harness_modules}
+        packages = {}
+        for name, us in added.items():
+            root = name.split(".")[0]
+            packages[root] = packages.get(root, 0) + us
+        top = sorted(packages.items(), key=lambda item: -item[1])[:10]
+        results[page] = {
+            "first_run_s": run["first_run_s"],
+            "import_ms": sum(added.values()) / 1000,
+            "modules": len(added),
+            "packages": {name: us / 1000 for name, us in top},
+            "model_stack": sorted(p for p in MODEL_PACKAGES if p in packages),
+        }
+    return results
+
+
+def check_startup(startup, budget_ms=None):
+    """Print pages that import the model stack without needing it, or exceed `budget_ms` of imports."""
+    problems = 0
+    for page, entry in startup.items():
+        if page == "harness":
+            continue
+        if entry["model_stack"] and page not in MODEL_PAGES:
+            problems += 1
+            print(f"STARTUP  {page} imports {', '.join(entry['model_stack'])} but does not need the model")
+        if budget_ms is not None and entry["import_ms"] > budget_ms:
+            problems += 1
+            print(f"STARTUP  {page} spends {entry['import_ms']:.0f} ms importing (budget {budget_ms:.0f} ms)")
+    print(f"{problems} startup problems" + (f" (import budget {budget_ms:.0f} ms)" if budget_ms is not None else ""))
+    return problems
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(obj, prefix=""):
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from _flatten(value, f"{prefix}{key}.")
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield prefix.rstrip("."), obj
+
+
+def compare(baseline, current, tolerance=0.10):
+    """Print timing metrics (`*_s`, `*_ms`) that got slower than `baseline` by more than `tolerance`."""
+    old = dict(_flatten(baseline["results"]))
+    regressions = 0
+    for key, value in _flatten(current["results"]):
+        if not key.endswith(("_s", "_ms")) or key not in old or old[key] <= 0:
+            continue
+        ratio = value / old[key]
+        if ratio > 1 + tolerance:
+            regressions += 1
+            print(f"SLOWER {ratio:6.2f}x  {key}: {old[key]:.4g} -> {value:.4g}")
+    print(f"{regressions} timing regressions above {tolerance:.0%} vs baseline {baseline['meta'].get('git_revision')}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark load, render and inference hot paths.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated row counts (default: {DEFAULT_SIZES})")
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--workdir", help="scratch directory for generated data (default: a temp dir)")
+    parser.add_argument("--skip-insights", action="store_true", help="do not run the Insights page")
+    parser.add_argument("--repeat", type=int, default=200, help="single-row prediction repetitions")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--skip-startup", action="store_true", help="do not measure page import times")
+    parser.add_argument("--import-budget-ms", type=float, help="flag pages whose first-run imports exceed this")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    workroot = Path(args.workdir or tempfile.mkdtemp(prefix="diabetes-bench-"))
+    model = build_pipeline()
+
+    results = {}
+    for n in sizes:
+        workdir = workroot / str(n)
+        (workdir / "data").mkdir(parents=True, exist_ok=True)
+        (workdir / "models").mkdir(exist_ok=True)
+        csv_path = workdir / "data" / "diabetes_dataset.csv"
+        print(f"[{n:,} rows] generating data", file=sys.stderr)
+        if not csv_path.exists():
+            write_csv(csv_path, n)
+        joblib.dump(model, workdir / "models" / "xgb.pkl")
+
+        entry = {}
+        with _chdir(workdir):
+            print(f"[{n:,} rows] load", file=sys.stderr)
+            entry["load"] = bench_load(csv_path)
+        if not args.skip_insights:
+            print(f"[{n:,} rows] insights", file=sys.stderr)
+            entry["insights"] = bench_insights(workdir)
+        print(f"[{n:,} rows] prediction", file=sys.stderr)
+        # Only the feature columns of the largest batch are loaded, not the whole dataset.
+        cache = pq.ParquetFile(next((workdir / "data" / ".cache").glob("*.parquet")))
+        df = next(cache.iter_batches(batch_size=max(BATCH_SIZES), columns=FEATURES)).to_pandas()
+        entry["prediction"] = bench_prediction(model, df, args.repeat)
+        results[str(n)] = entry
+        del df
+    if not args.skip_startup and sizes:
+        # Page startup does not depend on the dataset size; measure it once, with the smallest dataset.
+        print("startup", file=sys.stderr)
+        results["startup"] = bench_startup(workroot / str(min(sizes)))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": {name: __import__(name).__version__ for name in ("pandas", "numpy", "xgboost", "plotly", "streamlit")},
+        },
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}")
+    problems = check_startup(results["startup"], args.import_budget_ms) if "startup" in results else 0
+    if args.baseline:
+        compare(json.loads(Path(args.baseline).read_text()), report)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Synthetic data and a stand-in model matching data/dataset_info.md.
+
+Values are drawn independently within the documented ranges; the target is a
+noisy function of HbA1c and fasting glucose so the stand-in model learns
+non-trivial trees. Only the shapes and dtypes matter for benchmarking.
+"""
+import numpy as np
+import pandas as pd
+
+from core.schema import CATEGORICAL_OPTIONS, FEATURES
+
+# column -> (low, high, decimals); decimals=None means integer
+NUMERIC_RANGES = {
+    "age": (18, 90, None),
+    "alcohol_consumption_per_week": (0, 30, None),
+    "physical_activity_minutes_per_week": (0, 600, None),
+    "diet_score": (0, 10, 1),
+    "sleep_hours_per_day": (3, 12, 1),
+    "screen_time_hours_per_day": (0, 12, 1),
+    "family_history_diabetes": (0, 1, None),
+    "hypertension_history": (0, 1, None),
+    "cardiovascular_history": (0, 1, None),
+    "bmi": (15, 45, 1),
+    "waist_to_hip_ratio": (0.7, 1.2, 2),
+    "systolic_bp": (90, 180, None),
+    "diastolic_bp": (60, 120, None),
+    "heart_rate": (50, 120, None),
+    "cholesterol_total": (120, 300, None),
+    "hdl_cholesterol": (20, 100, None),
+    "ldl_cholesterol": (50, 200, None),
+    "triglycerides": (50, 500, None),
+    "glucose_fasting": (70, 250, None),
+    "glucose_postprandial": (90, 350, None),
+    "insulin_level": (2, 50, 2),
+    "hba1c": (4, 14, 2),
+}
+STAGES = ["No Diabetes", "Pre-Diabetes", "Type 1", "Type 2", "Gestational"]
+
+
+def generate_dataset(n, seed=0):
+    """A DataFrame of `n` rows with every column of data/diabetes_dataset.csv."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in FEATURES:
+        if col in CATEGORICAL_OPTIONS:
+            data[col] = np.asarray(CATEGORICAL_OPTIONS[col], dtype=object)[rng.integers(0, len(CATEGORICAL_OPTIONS[col]), n)]
+            continue
+        low, high, decimals = NUMERIC_RANGES[col]
+        if decimals is None:
+            data[col] = rng.integers(low, high + 1, n)
+        else:
+            data[col] = rng.uniform(low, high, n).round(decimals)
+    df = pd.DataFrame(data, columns=FEATURES)
+    logit = 1.2 * (df["hba1c"] - 6.5) + 0.03 * (df["glucose_fasting"] - 126) + rng.normal(0, 1, n)
+    target = (logit > 0).astype(np.int64)
+    df["diabetes_risk_score"] = (100 / (1 + np.exp(-logit))).round(1)
+    df["diabetes_stage"] = np.where(target == 1, np.asarray(STAGES[2:], dtype=object)[rng.integers(0, 3, n)],
+                                    np.asarray(STAGES[:2], dtype=object)[rng.integers(0, 2, n)])
+    df["diagnosed_diabetes"] = target
+    return df
+
+
+def write_csv(path, n, chunk_rows=1_000_000, seed=0):
+    """Write `n` synthetic rows to `path` in chunks so 10M-row files fit in memory."""
+    for i, start in enumerate(range(0, n, chunk_rows)):
+        chunk = generate_dataset(min(chunk_rows, n - start), seed + i)
+        chunk.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+
+def build_pipeline(n_train=20_000, seed=0):
+    """Fit a stand-in of the production pipeline (see core.train) on synthetic rows."""
+    from core.train import make_pipeline
+
+    df = generate_dataset(n_train, seed)
+    return make_pipeline({"n_estimators": 200}, seed).fit(df[FEATURES], df["diagnosed_diabetes"])
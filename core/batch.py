@@ -0,0 +1,149 @@
+"""Chunked bulk scoring for CSV/Parquet patient extracts.
+
+Usage:
+    python -m core.batch patients.csv scored.parquet --chunksize 50000
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.model import MODEL_PATH, load_pipeline
+from core.schema import CATEGORICAL_FEATURES, FEATURES, select_features
+from core.scoring import DEFAULT_THRESHOLD, predict
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def _is_parquet(path):
+    return Path(str(path)).suffix.lower() in (".parquet", ".pq")
+
+
+def iter_chunks(source, chunksize=DEFAULT_CHUNKSIZE, fmt=None):
+    """Yield DataFrames of at most `chunksize` rows from a CSV or Parquet source.
+
+    `source` may be a path or a file-like object (e.g. a Streamlit upload);
+    `fmt` ("csv" or "parquet") overrides detection from the file suffix.
+    """
+    fmt = fmt or ("parquet" if _is_parquet(getattr(source, "name", source)) else "csv")
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=chunksize)
+
+
+def score_chunk(model, chunk, threshold=DEFAULT_THRESHOLD):
+    """Score one chunk with a single pipeline pass and append the results."""
+    labels, proba = predict(model, select_features(chunk), threshold)
+    out = chunk.copy()
+    out["prediction"] = labels
+    out["probability"] = proba if proba is not None else np.nan
+    return out
+
+
+def output_schema(df):
+    """Arrow schema of scored output with fixed column types, so every chunk is written alike.
+
+    Categorical features are strings, prediction is int64, and measurements,
+    flags and probabilities are nullable float64. Any other pass-through column
+    is written as a string: its type in one chunk says nothing about the next
+    (an all-missing column, or IDs that are numeric at first), so it is never
+    inferred.
+    """
+    import pyarrow as pa
+
+    fixed = {"prediction": pa.int64(), "probability": pa.float64()}
+    for col in FEATURES:
+        fixed[col] = pa.string() if col in CATEGORICAL_FEATURES else pa.float64()
+    return pa.schema([pa.field(col, fixed.get(col, pa.string())) for col in df.columns])
+
+
+class _ChunkWriter:
+    # Appends scored chunks to a CSV or Parquet file without holding them in memory.
+    def __init__(self, dest, fmt=None):
+        self.dest = dest
+        self.fmt = fmt or ("parquet" if _is_parquet(getattr(dest, "name", dest)) else "csv")
+        self._writer = None
+        self._header = True
+
+    def write(self, df):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.dest, output_schema(df))
+            schema = self._writer.schema
+            df = df[schema.names].copy()
+            for field in schema:
+                if field.type == pa.string():
+                    df[field.name] = df[field.name].astype("string")
+            self._writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        else:
+            df.to_csv(self.dest, mode="w" if self._header else "a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def score_file(model, source, dest, chunksize=DEFAULT_CHUNKSIZE, in_fmt=None, out_fmt=None,
+               threshold=DEFAULT_THRESHOLD, on_chunk=None, on_scored=None):
+    """Stream `source` through the model chunk by chunk into `dest`. Returns the row count.
+
+    `on_chunk` is called with the running row count and `on_scored` with each scored chunk.
+    A path `dest` is written through a temporary file and only replaced once every
+    chunk has been scored, so a failure never leaves a partial output behind.
+    """
+    out_fmt = out_fmt or ("parquet" if _is_parquet(getattr(dest, "name", dest)) else "csv")
+    target = Path(dest) if isinstance(dest, (str, os.PathLike)) else None
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp") if target is not None else None
+    writer = _ChunkWriter(tmp if tmp is not None else dest, out_fmt)
+    n_rows = 0
+    try:
+        try:
+            for chunk in iter_chunks(source, chunksize, in_fmt):
+                scored = score_chunk(model, chunk, threshold)
+                writer.write(scored)
+                if on_scored is not None:
+                    on_scored(scored)
+                n_rows += len(chunk)
+                if on_chunk is not None:
+                    on_chunk(n_rows)
+        finally:
+            writer.close()
+        if tmp is not None and tmp.exists():
+            os.replace(tmp, target)
+    finally:
+        if tmp is not None:
+            tmp.unlink(missing_ok=True)
+    return n_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet file of patients with the XGBoost pipeline.")
+    parser.add_argument("input", help="input .csv or .parquet file with the build_input feature columns")
+    parser.add_argument("output", help="output .csv or .parquet file (input columns + prediction, probability)")
+    parser.add_argument("--model", default=str(MODEL_PATH), help=f"pipeline artifact (default: {MODEL_PATH})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per model call")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"probability cut-off for prediction=1 (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    model = load_pipeline(args.model)
+    n_rows = score_file(
+        model, args.input, args.output, args.chunksize, threshold=args.threshold,
+        on_chunk=lambda n: print(f"scored {n:,} rows", file=sys.stderr),
+    )
+    print(f"Wrote {n_rows:,} scored rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""Cohort filters for the Insights page, evaluated on precomputed per-cell aggregates.
+
+`CohortIndex` is built once per dataset version from only the filter columns
+(read from the Parquet cache): every dimension is stored as one small integer
+code per row, and the codes of all dimensions together name the row's cell.
+A selection becomes, per dimension, a lookup table of allowed codes, and the
+dimensions are combined with a vectorized AND over the grid of cells, so no
+string comparison, DataFrame query or row scan runs per filter.
+
+`CohortCube` holds, per (cell, diabetes status), the counts of every column the
+Insights charts draw, read in one chunked pass over only those columns:
+  - numeric columns with at most `GRID_SLOTS` distinct values are counted per
+    exact value; wider ones on an even grid of `GRID_SLOTS` steps over the
+    population range, which the chart bin counts (20, 24, 40) divide exactly
+  - categorical columns per category
+  - shifted sums and cross-products of `CORRELATION_COLUMNS`, for Pearson
+    correlations
+  - a random pool of up to `POOL_SIZE` rows per status for the scatter and
+    density views
+A filter combination then only sums the entries of its matching cells into a
+`DatasetStats` (`cohort_stats()`), so its cost is bounded by the number of
+cells and grid slots, not by the number of rows. Cohort histograms use the
+population's bin edges, so cohorts are drawn on the same axes.
+"""
+import numpy as np
+import pandas as pd
+
+from core.data import DATA_PATH, add_derived_columns, cache_path, dataset_version, read_csv
+from core.schema import BINARY_FEATURES, CATEGORICAL_OPTIONS
+from core.stats import DEFAULT_CHUNKSIZE, TARGET, DatasetStats, ValueCounts, iter_dataset
+
+AGE_BANDS = ["18-29", "30-39", "40-49", "50-59", "60-69", "70+"]
+AGE_BINS = [-np.inf, 30, 40, 50, 60, 70, np.inf]
+FLAG_LABELS = ["No", "Yes"]
+
+# Filter dimension -> sidebar label
+DIMENSIONS = {
+    "gender": "Gender",
+    "ethnicity": "Ethnicity",
+    "age_band": "Age band",
+    "income_level": "Income level",
+    "smoking_status": "Smoking status",
+    "family_history_diabetes": "Family history of diabetes",
+    "hypertension_history": "Hypertension",
+    "cardiovascular_history": "Cardiovascular disease",
+}
+
+# Columns the Insights charts draw for a cohort; `build_cube` reads only these.
+CHART_NUMERIC = [
+    "age", "alcohol_consumption_per_week", "physical_activity_minutes_per_week", "sleep_hours_per_day",
+    "screen_time_hours_per_day", "bmi", "systolic_bp", "diastolic_bp", "cholesterol_total", "hdl_cholesterol",
+    "ldl_cholesterol", "triglycerides", "insulin_level", "glucose_fasting", "hba1c",
+] + BINARY_FEATURES + [TARGET]
+CHART_CATEGORICAL = list(CATEGORICAL_OPTIONS) + ["BMI Category"]
+CORRELATION_COLUMNS = ["hba1c", "glucose_fasting", "insulin_level", "bmi", "systolic_bp", "triglycerides"]
+SCATTER_COLUMNS = ("age", "hba1c")
+GRID_SLOTS = 120  # divisible by every Insights histogram bin count
+POOL_SIZE = 100_000  # scatter/density rows kept per status
+FLUSH_ROWS = 2_000_000  # rows of per-chunk counts collected before they are merged
+
+
+def _codes(series, labels):
+    # Code of each row's value in `labels`; values outside them get -1 and never match a selection.
+    return pd.Categorical(series.astype(str), categories=labels).codes.astype(np.int8)
+
+
+class CohortIndex:
+    def __init__(self, codes, labels):
+        self.codes = codes  # dimension -> int8 array, one code per row
+        self.labels = labels  # dimension -> labels in display order
+        self.n_rows = len(next(iter(codes.values()))) if codes else 0
+        # Cell-space extent of every dimension: one slot per label, plus slot 0 for values outside them.
+        self.shape = tuple(len(labels[dim]) + 1 for dim in codes)
+        self.cell_counts = np.bincount(self.cells(), minlength=int(np.prod(self.shape))) if codes else None
+
+    @classmethod
+    def from_frame(cls, df):
+        codes, labels = {}, {}
+        for dim in DIMENSIONS:
+            if dim == "age_band":
+                labels[dim] = AGE_BANDS
+                codes[dim] = pd.cut(df["age"], AGE_BINS, right=False, labels=False).fillna(-1).to_numpy(np.int8)
+            elif dim in BINARY_FEATURES:
+                labels[dim] = FLAG_LABELS
+                codes[dim] = df[dim].to_numpy(np.int8)
+            else:
+                labels[dim] = CATEGORICAL_OPTIONS[dim]
+                codes[dim] = _codes(df[dim], labels[dim])
+        return cls(codes, labels)
+
+    def _allowed(self, dim, chosen):
+        # Lookup table over codes 0..n-1 and a last slot for code -1, which never matches a selection.
+        allowed = np.zeros(len(self.labels[dim]) + 1, dtype=bool)
+        allowed[[self.labels[dim].index(label) for label in chosen]] = True
+        return allowed
+
+    def cells(self, start=0, stop=None):
+        """Flat cell number of the rows in [start, stop), from their codes in every dimension."""
+        return np.ravel_multi_index([self.codes[dim][start:stop].astype(np.int64) + 1 for dim in self.codes],
+                                    self.shape)
+
+    def count(self, selection):
+        """Number of rows matching `selection`, from the per-cell row counts."""
+        return int(self.cell_counts[self.cell_mask(selection)].sum())
+
+    def cell_mask(self, selection):
+        """Boolean over all cells, True where every dimension matches `selection` ({dimension: [labels]})."""
+        mask = np.ones(self.shape, dtype=bool)
+        for axis, dim in enumerate(self.codes):
+            if selection.get(dim):
+                allowed = np.roll(self._allowed(dim, selection[dim]), 1)  # code -1 -> slot 0
+                mask &= allowed.reshape([-1 if a == axis else 1 for a in range(len(self.shape))])
+        return mask.ravel()
+
+
+def selection_key(selection):
+    """Canonical, hashable form of a selection, e.g. for cache keys; () means the whole population."""
+    return tuple((dim, tuple(sorted(chosen))) for dim, chosen in sorted(selection.items()) if chosen)
+
+
+def build_index(path=DATA_PATH):
+    """Read only the filter columns of the dataset (Parquet cache if built, else the CSV) and build its `CohortIndex`."""
+    import pyarrow.parquet as pq
+
+    columns = ["age"] + [d for d in DIMENSIONS if d != "age_band"]
+    target = cache_path(path, dataset_version(path))
+    if target.exists():
+        return CohortIndex.from_frame(pq.read_table(target, columns=columns, memory_map=True).to_pandas())
+    return CohortIndex.from_frame(read_csv(path, usecols=columns))
+
+
+def _merge_counts(parts):
+    # Sum (keys, counts) pairs into one pair with sorted, unique keys.
+    keys, inverse = np.unique(np.concatenate([k for k, _ in parts]), return_inverse=True)
+    return keys, np.bincount(inverse.ravel(), weights=np.concatenate([c for _, c in parts]), minlength=len(keys))
+
+
+def _sums_by(keys, values):
+    # Column sums of `values` per distinct key: (sorted unique keys, sums).
+    unique, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.ravel()
+    return unique, np.stack([np.bincount(inverse, weights=v, minlength=len(unique)) for v in values.T], axis=1)
+
+
+class CohortCube:
+    """Per-(cell, status) aggregates of the chart columns; see the module docstring."""
+
+    def __init__(self, index, population):
+        self.index = index
+        self.columns = population.columns
+        self.dtypes = dict(population.dtypes)
+        self.sample_size = population.sample_size
+        self.slots = {}  # column -> value of every slot (exact values, grid midpoints or category labels)
+        self.edges = {}  # numeric column -> grid edges, None when counted per exact value
+        self.steps = {}  # numeric column -> grid step, 0 when counted per exact value
+        self.range = {}
+        for col in CHART_NUMERIC:
+            i = population.numeric.index(col)
+            self.range[col] = population.moments["min"][i], population.moments["max"][i]
+            values = population.value_counts(col)[col].to_numpy(dtype=float)
+            if len(values) <= GRID_SLOTS:
+                self.slots[col], self.edges[col], self.steps[col] = values, None, 0.0
+            else:
+                edges = np.linspace(*self.range[col], GRID_SLOTS + 1)
+                self.slots[col], self.edges[col], self.steps[col] = (edges[:-1] + edges[1:]) / 2, edges, edges[1] - edges[0]
+                self.dtypes[col] = "float64"  # grid midpoints are not whole numbers
+        for col in CHART_CATEGORICAL:
+            self.slots[col] = list(population.category_order[col])
+        self.shift = np.array([population.mean(col) for col in CORRELATION_COLUMNS])
+        # column -> (keys, counts), key = (cell * 2 + status) * len(slots) + slot
+        self.counts = {col: (np.empty(0, dtype=np.int64), np.empty(0)) for col in self.slots}
+        self._pending = {col: [] for col in self.slots}
+        self._pending_rows = 0
+        # Per (cell * 2 + status): row count, sums and cross-products of CORRELATION_COLUMNS minus `shift`.
+        self.comoments = (np.empty(0, dtype=np.int64), np.empty((0, 1 + len(self.shift) * (1 + len(self.shift)))))
+        self.pool = None
+        self.rng = np.random.default_rng(0)
+        self.n_rows = 0
+
+    def _slot(self, col, values):
+        # Slot of every value of `col`; -1 where it is missing (or, for a column of exact values, unseen).
+        if col in CHART_CATEGORICAL:
+            return pd.Categorical(values.astype(str), categories=self.slots[col]).codes.astype(np.int64)
+        values = values.to_numpy(dtype=float)
+        if self.edges[col] is not None:
+            slots = np.clip(np.searchsorted(self.edges[col], values, side="right") - 1, 0, GRID_SLOTS - 1)
+        else:
+            slots = np.minimum(np.searchsorted(self.slots[col], values), len(self.slots[col]) - 1)
+            slots = np.where(self.slots[col][slots] == values, slots, -1)
+        return np.where(np.isfinite(values), slots, -1)
+
+    def update(self, chunk):
+        """Fold the next chunk of dataset rows (in index order) into the cell aggregates."""
+        chunk = add_derived_columns(chunk.reset_index(drop=True))
+        groups = self.index.cells(self.n_rows, self.n_rows + len(chunk)) * 2 + chunk[TARGET].to_numpy()
+        for col in self.slots:
+            slots = self._slot(col, chunk[col])
+            valid = slots >= 0
+            keys, counts = np.unique(groups[valid] * len(self.slots[col]) + slots[valid], return_counts=True)
+            self._pending[col].append((keys, counts.astype(float)))
+        self._pending_rows += len(chunk)
+        if self._pending_rows >= FLUSH_ROWS:
+            self._flush()
+
+        X = chunk[CORRELATION_COLUMNS].to_numpy(dtype=float) - self.shift
+        complete = np.isfinite(X).all(axis=1)
+        X = X[complete]
+        sums = np.hstack([np.ones((len(X), 1)), X, (X[:, :, None] * X[:, None, :]).reshape(len(X), -1)])
+        keys, sums = _sums_by(groups[complete], sums)
+        old_keys, old_sums = self.comoments
+        self.comoments = _sums_by(np.concatenate([old_keys, keys]), np.concatenate([old_sums, sums]))
+
+        rows = chunk[list(SCATTER_COLUMNS) + ["diagnosed_diabetes_str", TARGET]].copy()
+        rows["_key"] = self.rng.random(len(rows))
+        rows["_row"] = np.arange(self.n_rows, self.n_rows + len(rows))
+        rows["_group"] = groups
+        pool = rows if self.pool is None else pd.concat([self.pool, rows], ignore_index=True)
+        self.pool = pool.sort_values("_key").groupby(TARGET, observed=True).head(POOL_SIZE)
+        self.n_rows += len(chunk)
+        return self
+
+    def _flush(self):
+        for col, pending in self._pending.items():
+            if pending:
+                self.counts[col] = _merge_counts([self.counts[col]] + pending)
+                pending.clear()
+        self._pending_rows = 0
+
+    def finish(self):
+        """Merge the counts still pending from the last chunks; call once after the last `update`."""
+        self._flush()
+        return self
+
+    def stats(self, selection):
+        """`DatasetStats` of the rows matching `selection`, summed from the cells it covers."""
+        group_ok = np.repeat(self.index.cell_mask(selection), 2)
+        out = DatasetStats(sample_size=self.sample_size)
+        out.columns, out.dtypes, out.numeric = self.columns, self.dtypes, CHART_NUMERIC
+        out.values = {col: {} for col in CHART_NUMERIC}
+        out.categories = {col: None for col in CHART_CATEGORICAL}
+        out.category_order = {col: list(self.slots[col]) for col in CHART_CATEGORICAL}
+        for col, (keys, counts) in self.counts.items():
+            n_slots = len(self.slots[col])
+            groups, slots = np.divmod(keys, n_slots)
+            keep = group_ok[groups]
+            by_status = np.bincount((groups[keep] % 2) * n_slots + slots[keep], weights=counts[keep],
+                                    minlength=2 * n_slots).reshape(2, n_slots)
+            for code, slot_counts in enumerate(by_status):
+                present = np.flatnonzero(slot_counts)
+                if not len(present):
+                    continue
+                if col in CHART_CATEGORICAL:
+                    labels = [self.slots[col][j] for j in present]
+                    counts_col = pd.Series(slot_counts[present],
+                                           index=pd.MultiIndex.from_arrays([labels, [code] * len(labels)]))
+                    previous = out.categories[col]
+                    out.categories[col] = counts_col if previous is None else previous.add(counts_col, fill_value=0)
+                else:
+                    vc = ValueCounts(1)
+                    vc.keys, vc.counts = self.slots[col][present][:, None], slot_counts[present]
+                    vc.step = np.array([self.steps[col]])
+                    out.values[col][code] = vc
+        out.n_rows = int(sum(vc.total for vc in out.values[TARGET].values()))
+
+        # Moments from the slot counts; min/max are the population's, so histograms share its bin edges.
+        moments = {"count": [], "mean": [], "M2": []}
+        for col in CHART_NUMERIC:
+            merged = list(out.values[col].values())
+            values = np.concatenate([vc.keys[:, 0] for vc in merged] or [np.empty(0)])
+            weights = np.concatenate([vc.counts for vc in merged] or [np.empty(0)])
+            n = weights.sum()
+            mean = (values * weights).sum() / n if n else 0.0
+            moments["count"].append(n)
+            moments["mean"].append(mean)
+            moments["M2"].append((weights * (values - mean) ** 2).sum())
+        out.moments = {name: np.array(v) for name, v in moments.items()}
+        out.moments["min"] = np.array([self.range[col][0] for col in CHART_NUMERIC])
+        out.moments["max"] = np.array([self.range[col][1] for col in CHART_NUMERIC])
+
+        # Co-moments of CORRELATION_COLUMNS; every other pair of columns is left NaN.
+        p = len(CORRELATION_COLUMNS)
+        keys, sums = self.comoments
+        sums = sums[group_ok[keys]].sum(axis=0)
+        n, s1, s2 = sums[0], sums[1:1 + p], sums[1 + p:].reshape(p, p)
+        C = np.full((len(CHART_NUMERIC), len(CHART_NUMERIC)), np.nan)
+        idx = [CHART_NUMERIC.index(col) for col in CORRELATION_COLUMNS]
+        C[np.ix_(idx, idx)] = s2 - np.outer(s1, s1) / n if n else np.nan
+        out.comoments = {"n": n, "mean": np.full(len(CHART_NUMERIC), np.nan), "C": C}
+
+        # Scatter sample and density grid from the cohort's rows in the random pool, with the
+        # density counts scaled up to the cohort's size per status.
+        rows = self.pool[group_ok[self.pool["_group"].to_numpy()]].drop(columns="_group")
+        out.sample = rows.groupby(TARGET, observed=True).head(self.sample_size)
+        out.joint = {SCATTER_COLUMNS: {}}
+        for code, part in rows.groupby(TARGET, observed=True):
+            weights = np.full(len(part), out.values[TARGET][code].total / len(part))
+            out.joint[SCATTER_COLUMNS][code] = ValueCounts(2).update(part[list(SCATTER_COLUMNS)], weights)
+        return out
+
+
+def build_cube(index, population, path=DATA_PATH, chunksize=None):
+    """Aggregate the chart columns per cell of `index` in one chunked pass over only those columns.
+
+    `population` is the whole dataset's `DatasetStats`, which fixes the slots of
+    every column. Rows are streamed in the same order the index was built from.
+    """
+    cube = CohortCube(index, population)
+    columns = [col for col in CHART_NUMERIC + CHART_CATEGORICAL if col != "BMI Category"]
+    for chunk in iter_dataset(path, chunksize or DEFAULT_CHUNKSIZE, columns=columns):
+        cube.update(chunk)
+    return cube.finish()
+
+
+def cohort_stats(cube, selection):
+    """`DatasetStats` of the rows matching `selection`, from the per-cell aggregates of `cube`."""
+    return cube.stats(selection)
@@ -0,0 +1,110 @@
+"""Typed, columnar cache of the diabetes dataset.
+
+The first load parses data/diabetes_dataset.csv once and writes a Parquet copy
+(string columns stored as categoricals) under data/.cache/. Later loads, from
+any Streamlit worker, memory-map that file instead of re-parsing the CSV. The
+cache is keyed on the CSV's content hash; the size/mtime recorded in a small
+manifest lets unchanged files skip re-hashing.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.schema import CATEGORICAL_FEATURES
+
+DATA_PATH = Path("data/diabetes_dataset.csv")
+CACHE_DIR = Path("data/.cache")
+CATEGORICAL_COLUMNS = CATEGORICAL_FEATURES + ["diabetes_stage"]
+
+BMI_CATEGORIES = ['Underweight - bmi < 18.5', 'Normal - bmi < 25', 'Overweight - bmi < 30', 'Obese - bmi > 30']
+BMI_BINS = [-np.inf, 18.5, 25, 30, np.inf]
+
+
+def _file_sha256(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _manifest_path(path):
+    return CACHE_DIR / f"{Path(path).stem}.json"
+
+
+def _read_manifest(path):
+    try:
+        return json.loads(_manifest_path(path).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def dataset_version(path=DATA_PATH):
+    """Return a short content hash identifying the current version of `path`.
+
+    Only re-hashes the file when its size or mtime differ from the manifest.
+    """
+    path = Path(path)
+    stat = path.stat()
+    manifest = _read_manifest(path)
+    if manifest.get("size") == stat.st_size and manifest.get("mtime_ns") == stat.st_mtime_ns:
+        return manifest["sha256"][:16]
+    sha = _file_sha256(path)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = {**manifest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha}
+    tmp = _manifest_path(path).with_suffix(f".json.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, _manifest_path(path))
+    return sha[:16]
+
+
+def cache_path(path=DATA_PATH, version=None):
+    path = Path(path)
+    return CACHE_DIR / f"{path.stem}-{version or dataset_version(path)}.parquet"
+
+
+def read_csv(path=DATA_PATH, **kwargs):
+    """Parse the raw CSV with categorical dtypes for the string columns."""
+    header = pd.read_csv(path, nrows=0).columns
+    dtype = {col: "category" for col in CATEGORICAL_COLUMNS if col in header}
+    return pd.read_csv(path, dtype=dtype, **kwargs)
+
+
+def build_cache(path=DATA_PATH, version=None):
+    """Convert the CSV into its Parquet cache and drop caches of older versions."""
+    target = cache_path(path, version)
+    df = read_csv(path)
+    # Write to a per-process temp file so concurrent workers never see a partial cache.
+    tmp = target.with_suffix(f".parquet.{os.getpid()}.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, target)
+    for stale in CACHE_DIR.glob(f"{Path(path).stem}-*.parquet"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return target
+
+
+def add_derived_columns(df):
+    """Add the chart-only columns used by Insights, in place, and return `df`.
+
+    `diagnosed_diabetes_str` is the 'No'/'Yes' status label and `BMI Category`
+    the clinical BMI band; both are vectorized categoricals.
+    """
+    df['diagnosed_diabetes_str'] = pd.Categorical.from_codes(df['diagnosed_diabetes'].to_numpy(), ['No', 'Yes'])
+    df['BMI Category'] = pd.cut(df['bmi'], BMI_BINS, right=False, labels=BMI_CATEGORIES)
+    return df
+
+
+def load_dataset(path=DATA_PATH):
+    """Load the dataset from its columnar cache, building the cache on first use."""
+    import pyarrow.parquet as pq
+
+    version = dataset_version(path)
+    target = cache_path(path, version)
+    if not target.exists():
+        build_cache(path, version)
+    return pq.read_table(target, memory_map=True).to_pandas()
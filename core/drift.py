@@ -0,0 +1,315 @@
+"""Input drift between scored patients and the training dataset.
+
+`load_reference()` turns the dataset statistics of `core.stats` (so no extra
+pass over the CSV) into a compact profile of every `build_input` feature:
+  - numeric features: cut points at the reference deciles with the share of
+    patients per bin (for PSI), and at the percentiles (for KS)
+  - categorical features: the share of each option
+The profile is stored as JSON beside the statistics, keyed on the dataset
+version and `REFERENCE_FORMAT`.
+
+`DriftMonitor` keeps the last `capacity` scored rows in a ring buffer together
+with their bin of every feature. Per-bin window counts are updated as rows
+enter and leave the buffer, so PSI and KS of the window cost O(bins) per
+feature however much traffic has been scored. The process-wide `MONITOR` is
+fed by the Prediction page and the scoring service and read by the Monitoring page.
+
+Usage:
+    python -m core.drift                          # build the reference profile
+    python -m core.drift --input patients.csv     # drift of a file against it
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.data import CACHE_DIR, DATA_PATH, dataset_version
+from core.schema import CATEGORICAL_FEATURES, CATEGORICAL_OPTIONS, FEATURES, NUMERIC_FEATURES
+
+# Bump whenever the profile layout or the binning parameters change.
+REFERENCE_FORMAT = 1
+PSI_BINS = 10
+KS_BINS = 100
+DEFAULT_CAPACITY = 5000
+MIN_ROWS = 100  # below this many window rows PSI is dominated by noise
+UNSEEN = "(unseen)"
+PSI_EPSILON = 1e-4
+# PSI rule of thumb: < 0.1 stable, 0.1-0.25 moderate shift, >= 0.25 major shift
+PSI_LEVELS = [(0.25, "major"), (0.1, "moderate"), (0.0, "stable")]
+KS_ALPHA_COEF = 1.358  # two-sample KS critical value coefficient at alpha = 0.05
+
+
+def reference_path(path=DATA_PATH, version=None):
+    path = Path(path)
+    return CACHE_DIR / f"{path.stem}-{version or dataset_version(path)}-v{REFERENCE_FORMAT}.drift.json"
+
+
+def _cuts(values, counts, n_bins):
+    # Values at the reference k/n_bins quantiles; a value equal to a cut falls in the bin above it.
+    cum = np.cumsum(counts) / counts.sum()
+    idx = np.searchsorted(cum, np.arange(1, n_bins) / n_bins, side="left")
+    cuts = np.unique(values[np.minimum(idx, len(values) - 1)])
+    return cuts[cuts > values[0]]
+
+
+def _shares(values, counts, cuts):
+    bins = np.searchsorted(cuts, values, side="right")
+    binned = np.bincount(bins, weights=counts, minlength=len(cuts) + 1)
+    return binned / binned.sum()
+
+
+def build_reference(stats, version, psi_bins=PSI_BINS, ks_bins=KS_BINS):
+    """Reference profile of every model feature from a `core.stats.DatasetStats`."""
+    features = {}
+    for col in FEATURES:
+        counts = stats.value_counts(col)
+        if col in CATEGORICAL_OPTIONS:
+            categories = CATEGORICAL_OPTIONS[col] + [UNSEEN]
+            by_value = counts.set_index(col)["count"]
+            shares = by_value.reindex(categories, fill_value=0).to_numpy(dtype=float)
+            shares[-1] = by_value.sum() - shares[:-1].sum()
+            features[col] = {"kind": "categorical", "categories": categories,
+                             "shares": (shares / by_value.sum()).tolist()}
+            continue
+        values = counts[col].to_numpy(dtype=float)
+        weights = counts["count"].to_numpy(dtype=float)
+        psi_cuts, ks_cuts = _cuts(values, weights, psi_bins), _cuts(values, weights, ks_bins)
+        features[col] = {
+            "kind": "numeric",
+            "psi_cuts": psi_cuts.tolist(), "psi_shares": _shares(values, weights, psi_cuts).tolist(),
+            "ks_cuts": ks_cuts.tolist(), "ks_shares": _shares(values, weights, ks_cuts).tolist(),
+        }
+    return {"dataset_version": version, "n_rows": int(stats.n_rows), "features": features}
+
+
+def load_reference(path=DATA_PATH):
+    """Reference profile of the current dataset version, built from its statistics on first use."""
+    from core.stats import load_stats
+
+    version = dataset_version(path)
+    target = reference_path(path, version)
+    if target.exists():
+        try:
+            return json.loads(target.read_text())
+        except ValueError:
+            pass  # truncated or not JSON: rebuild it
+    reference = build_reference(load_stats(path), version)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".json.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(reference))
+    os.replace(tmp, target)
+    for stale in CACHE_DIR.glob(f"{Path(path).stem}-*.drift.json"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return reference
+
+
+def psi(expected, actual, epsilon=PSI_EPSILON):
+    """Population stability index of the `actual` shares against the `expected` ones."""
+    expected = np.maximum(expected, epsilon)
+    actual = np.maximum(actual, epsilon)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def psi_level(value):
+    return next(label for bound, label in PSI_LEVELS if value >= bound)
+
+
+def _bin_labels(cuts):
+    cuts = [f"{c:g}" for c in cuts]
+    if not cuts:
+        return ["all"]
+    return [f"< {cuts[0]}"] + [f"[{a}, {b})" for a, b in zip(cuts, cuts[1:])] + [f">= {cuts[-1]}"]
+
+
+class DriftMonitor:
+    """Fixed-size ring buffer of scored rows with incrementally maintained per-bin counts."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._numeric = np.full((capacity, len(NUMERIC_FEATURES)), np.nan)
+        # Index of each categorical value in CATEGORICAL_OPTIONS; unknown values get the (unseen) slot.
+        self._codes = np.zeros((capacity, len(CATEGORICAL_FEATURES)), dtype=np.int16)
+        self._unseen = np.array([len(CATEGORICAL_OPTIONS[c]) for c in CATEGORICAL_FEATURES], dtype=np.int16)
+        self._proba = np.full(capacity, np.nan)
+        self._scored_at = np.zeros(capacity)
+        self._next = 0
+        self.size = 0
+        self.total = 0
+        self.reference = None
+        self._lock = threading.Lock()
+
+    def _layout(self):
+        # (feature, histogram, offset, n_bins) for every histogram; one extra trailing slot takes missing values.
+        layout, offset = [], 0
+        for col in FEATURES:
+            spec = self.reference["features"][col]
+            for hist in ("psi", "ks") if spec["kind"] == "numeric" else ("psi",):
+                n_bins = len(spec["categories"]) if spec["kind"] == "categorical" else len(spec[f"{hist}_cuts"]) + 1
+                layout.append((col, hist, offset, n_bins))
+                offset += n_bins
+        return layout, offset
+
+    def _bins(self, numeric, codes):
+        # Flat count-vector index of every row (rows x histograms).
+        out = np.empty((len(numeric), len(self._hists)), dtype=np.int32)
+        for j, (col, hist, offset, n_bins) in enumerate(self._hists):
+            spec = self.reference["features"][col]
+            if spec["kind"] == "categorical":
+                out[:, j] = offset + codes[:, CATEGORICAL_FEATURES.index(col)]
+                continue
+            values = numeric[:, NUMERIC_FEATURES.index(col)]
+            bins = offset + np.searchsorted(np.asarray(spec[f"{hist}_cuts"]), values, side="right")
+            out[:, j] = np.where(np.isnan(values), self._missing, bins)
+        return out
+
+    def _count(self, bins):
+        return np.bincount(bins.ravel(), minlength=self._missing + 1)
+
+    def attach(self, reference):
+        """Compare against `reference` from now on; rows already buffered are re-binned once."""
+        with self._lock:
+            if self.reference is not None and self.reference["dataset_version"] == reference["dataset_version"]:
+                return
+            self.reference = reference
+            self._hists, self._missing = self._layout()
+            self._row_bins = np.full((self.capacity, len(self._hists)), self._missing, dtype=np.int32)
+            if self.size:
+                slots = self._slots()
+                self._row_bins[slots] = self._bins(self._numeric[slots], self._codes[slots])
+            self._counts = self._count(self._row_bins[self._slots()])
+
+    def _slots(self):
+        # Occupied buffer positions, oldest first.
+        start = (self._next - self.size) % self.capacity
+        return (start + np.arange(self.size)) % self.capacity
+
+    def add(self, X, proba=None):
+        """Append the rows of `X` (the `build_input` columns) and their predicted probabilities."""
+        X = X.iloc[-self.capacity:]
+        n = len(X)
+        if not n:
+            return
+        numeric = X[NUMERIC_FEATURES].to_numpy(dtype=float)
+        codes = np.column_stack([
+            pd.Categorical(X[col].astype(str), categories=CATEGORICAL_OPTIONS[col]).codes
+            for col in CATEGORICAL_FEATURES
+        ]).astype(np.int16)
+        codes = np.where(codes < 0, self._unseen, codes)
+        proba = np.full(n, np.nan) if proba is None else np.asarray(proba, dtype=float)[-n:]
+        with self._lock:
+            slots = (self._next + np.arange(n)) % self.capacity
+            if self.reference is not None:
+                evicted = max(0, self.size + n - self.capacity)
+                if evicted:
+                    self._counts -= self._count(self._row_bins[self._slots()[:evicted]])
+                bins = self._bins(numeric, codes)
+                self._row_bins[slots] = bins
+                self._counts += self._count(bins)
+            self._numeric[slots] = numeric
+            self._codes[slots] = codes
+            self._proba[slots] = proba
+            self._scored_at[slots] = time.time()
+            self._next = (self._next + n) % self.capacity
+            self.size = min(self.capacity, self.size + n)
+            self.total += n
+
+    def clear(self):
+        with self._lock:
+            self._next = self.size = self.total = 0
+            if self.reference is not None:
+                self._row_bins[:] = self._missing
+                self._counts[:] = 0
+
+    def _window_shares(self, offset, n_bins):
+        counts = self._counts[offset:offset + n_bins]
+        n = counts.sum()
+        return counts / n if n else np.zeros(n_bins), int(n)
+
+    def report(self):
+        """One row per feature: PSI (with its level) and, for numeric features, the KS statistic and critical value."""
+        with self._lock:
+            if self.reference is None:
+                raise RuntimeError("attach() a reference profile first")
+            n_ref = self.reference["n_rows"]
+            rows = {}
+            for col, hist, offset, n_bins in self._hists:
+                spec = self.reference["features"][col]
+                shares, n = self._window_shares(offset, n_bins)
+                row = rows.setdefault(col, {"feature": col, "kind": spec["kind"], "n": n})
+                if hist == "psi":
+                    expected = spec["shares"] if spec["kind"] == "categorical" else spec["psi_shares"]
+                    row["psi"] = psi(np.asarray(expected), shares) if n else np.nan
+                else:
+                    gap = np.abs(np.cumsum(spec["ks_shares"]) - np.cumsum(shares))
+                    row["ks"] = float(gap.max()) if n else np.nan
+                    row["ks_critical"] = KS_ALPHA_COEF * np.sqrt((n + n_ref) / (n * n_ref)) if n else np.nan
+        table = pd.DataFrame(list(rows.values()), columns=["feature", "kind", "n", "psi", "ks", "ks_critical"])
+        table["level"] = [psi_level(v) if np.isfinite(v) else "" for v in table["psi"]]
+        table["ks_drift"] = table["ks"] > table["ks_critical"]
+        return table
+
+    def compare(self, col):
+        """Reference and window shares per PSI bin of `col`: columns [bin, reference, window]."""
+        with self._lock:
+            spec = self.reference["features"][col]
+            offset, n_bins = next((o, b) for c, h, o, b in self._hists if c == col and h == "psi")
+            shares, _ = self._window_shares(offset, n_bins)
+        if spec["kind"] == "categorical":
+            labels, expected = spec["categories"], spec["shares"]
+        else:
+            labels, expected = _bin_labels(spec["psi_cuts"]), spec["psi_shares"]
+        return pd.DataFrame({"bin": labels, "reference": expected, "window": shares})
+
+    def recent(self):
+        """The buffered rows, oldest first, with their probability and scoring time."""
+        with self._lock:
+            slots = self._slots()
+            df = pd.DataFrame(self._numeric[slots], columns=NUMERIC_FEATURES)
+            for j, col in enumerate(CATEGORICAL_FEATURES):
+                labels = np.array(CATEGORICAL_OPTIONS[col] + [UNSEEN], dtype=object)
+                df[col] = labels[self._codes[slots, j]]
+            df["probability"] = self._proba[slots]
+            df["scored_at"] = pd.to_datetime(self._scored_at[slots], unit="s")
+        return df[FEATURES + ["probability", "scored_at"]]
+
+    def stats(self):
+        with self._lock:
+            slots = self._slots()
+            proba = self._proba[slots]
+            return {
+                "size": self.size,
+                "capacity": self.capacity,
+                "total": self.total,
+                "mean_probability": float(np.nanmean(proba)) if np.isfinite(proba).any() else None,
+                "since": float(self._scored_at[slots[0]]) if self.size else None,
+            }
+
+
+# Shared by every session of the process.
+MONITOR = DriftMonitor()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the drift reference profile, or score a file against it.")
+    parser.add_argument("--data", default=str(DATA_PATH), help=f"reference dataset CSV (default: {DATA_PATH})")
+    parser.add_argument("--input", help="CSV or Parquet file of patients to compare with the reference")
+    args = parser.parse_args(argv)
+    reference = load_reference(args.data)
+    print(f"Reference of {reference['n_rows']:,} rows -> {reference_path(args.data)}")
+    if args.input:
+        df = pd.read_parquet(args.input) if args.input.lower().endswith(".parquet") else pd.read_csv(args.input)
+        monitor = DriftMonitor(capacity=max(1, len(df)))
+        monitor.attach(reference)
+        monitor.add(df)
+        table = monitor.report().sort_values("psi", ascending=False)
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
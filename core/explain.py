@@ -0,0 +1,157 @@
+"""Offline feature-importance and SHAP summaries for the prediction pipeline.
+
+XGBoost's gain/cover/weight importances and dataset-level TreeSHAP summaries
+(via the booster's native `pred_contribs`, no extra dependency) are computed
+once per model version, mapped back through the ColumnTransformer's output
+names to the original `build_input` fields, and written beside the artifact
+as models/xgb.importance.json. The Overview page only reads that file.
+
+Usage:
+    python -m core.explain --sample 5000
+"""
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.model import MODEL_PATH, artifact_version, get_model, split_pipeline, transform, transformed_feature_names
+from core.schema import FEATURES, select_features
+
+IMPORTANCE_TYPES = ["weight", "gain", "cover", "total_gain", "total_cover"]
+
+
+def importance_path(path=MODEL_PATH):
+    return Path(path).with_suffix(".importance.json")
+
+
+def original_feature(name):
+    """Map a transformed column name ('cat__gender_Male', 'num__age') to its input field."""
+    base = name.split("__", 1)[-1]
+    matches = [f for f in FEATURES if base == f or base.startswith(f + "_")]
+    return max(matches, key=len) if matches else base
+
+
+def feature_groups(names):
+    """Indices of the transformed columns belonging to each original field, in FEATURES order."""
+    owners = [original_feature(n) for n in names]
+    groups = {}
+    for i, owner in enumerate(owners):
+        groups.setdefault(owner, []).append(i)
+    ordered = [f for f in FEATURES if f in groups] + [f for f in groups if f not in FEATURES]
+    return {f: groups[f] for f in ordered}
+
+
+def shap_contributions(booster, Xt):
+    """TreeSHAP contributions per transformed column (bias column dropped)."""
+    from xgboost import DMatrix
+
+    return booster.predict(DMatrix(Xt), pred_contribs=True)[:, :-1]
+
+
+def aggregate_contributions(contribs, groups):
+    """Sum per-column contributions into one column per original field: shape (rows, len(groups))."""
+    return np.column_stack([contribs[:, idx].sum(axis=1) for idx in groups.values()])
+
+
+def explain(model, X):
+    """Score `X` and attribute each prediction to the original input fields, in one pass.
+
+    The rows go through the preprocessing steps once; the booster's TreeSHAP
+    contributions on that output also give the margin, so a binary:logistic
+    model needs no separate predict_proba call. Returns `(proba, contributions,
+    bias)` where `contributions` is a DataFrame of log-odds contributions with
+    one column per input field, or None if the estimator is not XGBoost.
+    """
+    steps, estimator = split_pipeline(model)
+    if not hasattr(estimator, "get_booster"):
+        return model.predict_proba(X)[:, 1], None, None
+    Xt = transform(steps, X)
+    from xgboost import DMatrix
+
+    full = estimator.get_booster().predict(DMatrix(Xt), pred_contribs=True)
+    if getattr(estimator, "objective", None) == "binary:logistic":
+        proba = 1.0 / (1.0 + np.exp(-full.sum(axis=1)))
+    else:
+        proba = estimator.predict_proba(Xt)[:, 1]
+    names = transformed_feature_names(steps) or [f"f{i}" for i in range(Xt.shape[1])]
+    groups = feature_groups(names)
+    contributions = pd.DataFrame(aggregate_contributions(full[:, :-1], groups), columns=list(groups), index=X.index)
+    return proba, contributions, full[:, -1]
+
+
+def compute_importance(model, X):
+    """Return `(transformed_table, feature_table)` of importances and mean |SHAP| on `X`."""
+    steps, estimator = split_pipeline(model)
+    booster = estimator.get_booster()
+    Xt = transform(steps, X)
+    names = transformed_feature_names(steps) or [f"f{i}" for i in range(Xt.shape[1])]
+    # Boosters fitted on arrays report scores as 'f0', 'f1', ...; fitted on frames, by column name.
+    keys = booster.feature_names or [f"f{i}" for i in range(len(names))]
+
+    transformed = pd.DataFrame({"feature": names, "input_feature": [original_feature(n) for n in names]})
+    for kind in IMPORTANCE_TYPES:
+        scores = booster.get_score(importance_type=kind)
+        transformed[kind] = [float(scores.get(k, 0.0)) for k in keys]
+    contribs = shap_contributions(booster, Xt)
+    transformed["mean_abs_shap"] = np.abs(contribs).mean(axis=0)
+
+    groups = feature_groups(names)
+    by_input = transformed.groupby("input_feature", sort=False)[["weight", "total_gain", "total_cover"]].sum()
+    features = by_input.reindex(list(groups)).reset_index().rename(columns={"input_feature": "feature"})
+    weight = features["weight"].replace(0, np.nan)
+    features["gain"] = (features["total_gain"] / weight).fillna(0.0)
+    features["cover"] = (features["total_cover"] / weight).fillna(0.0)
+    features["mean_abs_shap"] = np.abs(aggregate_contributions(contribs, groups)).mean(axis=0)
+    return transformed, features
+
+
+def build_report(path=MODEL_PATH, sample=5000, seed=0, force=False):
+    """Compute the importance report for the current artifact and dataset and write it to disk.
+
+    Does nothing if the existing report already matches both versions, unless `force`.
+    """
+    from core.data import DATA_PATH, dataset_version, load_dataset
+
+    out = importance_path(path)
+    existing = load_report(path)
+    if (not force and existing
+            and existing["model_version"] == artifact_version(path)
+            and existing["dataset_version"] == dataset_version(DATA_PATH)):
+        return out
+    model = get_model(path)
+    df = load_dataset(DATA_PATH)
+    if sample and len(df) > sample:
+        df = df.sample(sample, random_state=seed)
+    transformed, features = compute_importance(model, select_features(df))
+    report = {
+        "model_version": artifact_version(path),
+        "dataset_version": dataset_version(DATA_PATH),
+        "n_rows": len(df),
+        "features": features.to_dict(orient="records"),
+        "transformed_features": transformed.to_dict(orient="records"),
+    }
+    out.write_text(json.dumps(report, indent=2))
+    return out
+
+
+def load_report(path=MODEL_PATH):
+    """Read the persisted report, or return None if it has not been built yet."""
+    try:
+        return json.loads(importance_path(path).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute feature importances and SHAP summaries for the model.")
+    parser.add_argument("--model", default=str(MODEL_PATH), help=f"pipeline artifact (default: {MODEL_PATH})")
+    parser.add_argument("--sample", type=int, default=5000, help="rows of the dataset used for SHAP summaries (0 = all)")
+    parser.add_argument("--force", action="store_true", help="recompute even if the report is up to date")
+    args = parser.parse_args(argv)
+    print(f"Report: {build_report(args.model, args.sample, force=args.force)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Process-wide registry for the prediction pipeline.
+
+`get_model()` loads models/xgb.pkl once per process, checks that it expects the
+`build_input` feature schema and runs a warm-up prediction, so the first real
+request does not pay for unpickling or XGBoost's first-predict setup. The
+artifact is reloaded automatically when the file on disk changes.
+
+The booster can also be exported in XGBoost's native format next to the fitted
+preprocessor (models/xgb.ubj + models/xgb.preprocess.pkl). When present and not
+older than the pickle, that pair is loaded instead:
+    python -m core.model --export-native
+"""
+import argparse
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+from core.schema import EXAMPLE_INPUT, FEATURES, build_input
+from core.telemetry import cache_miss
+
+MODEL_PATH = Path("models/xgb.pkl")
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_loaded = {}  # path -> (version, model)
+_versions = {}  # ((file, size, mtime_ns), ...) -> content hash
+
+
+def native_paths(path=MODEL_PATH, fmt="ubj"):
+    """Paths of the fitted preprocessor and the native booster for artifact `path`."""
+    path = Path(path)
+    return path.with_suffix(".preprocess.pkl"), path.with_suffix(f".{fmt}")
+
+
+def _preprocess_steps(pipeline):
+    # Inference-time steps before the estimator; samplers such as SMOTE only act during fit.
+    return [(name, step) for name, step in pipeline.steps[:-1] if not hasattr(step, "fit_resample")]
+
+
+def split_pipeline(model):
+    """Return `(preprocess_steps, estimator)` for inference on a fitted pipeline."""
+    return _preprocess_steps(model), model.steps[-1][1]
+
+
+def transform(steps, X):
+    """Apply `split_pipeline` preprocessing steps to `X` (one pass through the ColumnTransformer)."""
+    for _, step in steps:
+        X = step.transform(X)
+    return X
+
+
+def transformed_feature_names(steps):
+    """Output column names of the preprocessing steps, e.g. 'cat__gender_Male'."""
+    return list(steps[-1][1].get_feature_names_out()) if steps else None
+
+
+def export_native(pipeline, path=MODEL_PATH, fmt="ubj"):
+    """Write the preprocessor (pickle) and the booster (native JSON/UBJ) beside `path`."""
+    import joblib
+
+    preprocess_path, booster_path = native_paths(path, fmt)
+    joblib.dump(_preprocess_steps(pipeline), preprocess_path)
+    pipeline.steps[-1][1].save_model(booster_path)
+    return preprocess_path, booster_path
+
+
+def _load_native(preprocess_path, booster_path):
+    import joblib
+    from sklearn.pipeline import Pipeline
+    from xgboost import XGBClassifier
+
+    clf = XGBClassifier()
+    clf.load_model(booster_path)
+    return Pipeline(joblib.load(preprocess_path) + [("model", clf)])
+
+
+def _native_artifact(path):
+    # Native pair to load instead of the pickle, if one exists and is at least as new.
+    path = Path(path)
+    for fmt in ("ubj", "json"):
+        preprocess_path, booster_path = native_paths(path, fmt)
+        if preprocess_path.exists() and booster_path.exists():
+            if not path.exists() or booster_path.stat().st_mtime >= path.stat().st_mtime:
+                return preprocess_path, booster_path
+    return None
+
+
+def _sha256(files, block_size=1 << 20):
+    h = hashlib.sha256()
+    for file in files:
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def artifact_version(path=MODEL_PATH):
+    """Short content hash of the artifact on disk (the native pair if it is loaded instead).
+
+    The same model keeps its version across checkouts and copies; the files are only
+    re-hashed when their size or mtime differ from the last call in this process.
+    """
+    native = _native_artifact(path)
+    files = native if native else (Path(path),)
+    key = tuple((str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in files)
+    if key not in _versions:
+        _versions[key] = _sha256(files)[:16]
+    return _versions[key]
+
+
+def load_pipeline(path=MODEL_PATH):
+    """Load the pipeline from its native export if available, else from the pickle."""
+    import joblib
+
+    native = _native_artifact(path)
+    if native:
+        return _load_native(*native)
+    return joblib.load(path)
+
+
+def expected_features(model):
+    """Input column names the fitted pipeline was trained on, if it recorded them."""
+    first_step = [step for _, step in getattr(model, "steps", [])[:1]]
+    for est in [model] + first_step:
+        names = getattr(est, "feature_names_in_", None)
+        if names is not None:
+            return list(names)
+    return None
+
+
+def validate_features(model):
+    """Raise ValueError if the pipeline's input columns differ from the build_input schema."""
+    names = expected_features(model)
+    if names is None:
+        log.warning("Model does not record its input feature names; skipping schema check")
+        return
+    missing = [c for c in names if c not in FEATURES]
+    extra = [c for c in FEATURES if c not in names]
+    if missing or extra:
+        raise ValueError(
+            "Model features do not match the build_input schema "
+            f"(expected by model but not provided: {missing or 'none'}; provided but unused: {extra or 'none'})"
+        )
+
+
+def warm_up(model):
+    """Run one prediction on a canonical row to trigger lazy initialisation."""
+    model.predict_proba(build_input(EXAMPLE_INPUT))
+
+
+def get_model(path=MODEL_PATH):
+    """Return the validated, warmed-up pipeline for `path`, loading it at most once per version."""
+    path = Path(path)
+    version = artifact_version(path)
+    with _lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+        cache_miss()
+        model = load_pipeline(path)
+        validate_features(model)
+        warm_up(model)
+        _loaded[path] = (version, model)
+        log.info("Loaded model %s (version %s)", path, version)
+        return model
+
+
+def preload(path=MODEL_PATH):
+    """Start loading the model in a background thread; failures are logged, not raised."""
+    def _run():
+        try:
+            get_model(path)
+        except Exception:
+            log.exception("Could not preload model from %s", path)
+
+    thread = threading.Thread(target=_run, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Model artifact utilities.")
+    parser.add_argument("--model", default=str(MODEL_PATH), help=f"pipeline artifact (default: {MODEL_PATH})")
+    parser.add_argument("--export-native", action="store_true",
+                        help="write the booster in XGBoost's native format next to the fitted preprocessor")
+    parser.add_argument("--format", choices=["ubj", "json"], default="ubj", help="native booster format")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.model)
+    validate_features(model)
+    if args.export_native:
+        for p in export_native(model, args.model, args.format):
+            print(f"Wrote {p}")
+    else:
+        print(f"{args.model}: OK ({len(expected_features(model) or [])} input features)")
+
+
+if __name__ == "__main__":
+    main()
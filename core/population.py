@@ -0,0 +1,115 @@
+"""Risk scores of the whole dataset, for placing one patient in the population.
+
+`build_population()` scores data/diabetes_dataset.csv in chunks with the current
+model and stores the sorted probabilities beside the artifact as
+models/xgb.population.npz, tagged with the model and dataset versions. Above
+`max_points` rows only evenly spaced order statistics are kept, which bounds
+the file while keeping percentile lookups accurate to 1/`max_points`. The
+Prediction page then places a patient with one binary search.
+
+Usage:
+    python -m core.population --chunksize 100000
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from core.model import MODEL_PATH, artifact_version, get_model
+from core.schema import select_features
+
+DEFAULT_CHUNKSIZE = 100_000
+MAX_POINTS = 1_000_000
+
+
+def population_path(path=MODEL_PATH):
+    return Path(path).with_suffix(".population.npz")
+
+
+def score_population(model, data_path, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None):
+    """Positive-class probabilities for every row of the dataset, sorted ascending (float32)."""
+    from core.stats import iter_dataset
+
+    scores, n_rows = [], 0
+    for chunk in iter_dataset(data_path, chunksize):
+        scores.append(model.predict_proba(select_features(chunk))[:, 1].astype(np.float32))
+        n_rows += len(chunk)
+        if on_chunk is not None:
+            on_chunk(n_rows)
+    return np.sort(np.concatenate(scores))
+
+
+def compact(scores, max_points=MAX_POINTS):
+    """At most `max_points` evenly spaced order statistics of the sorted `scores` (including both ends)."""
+    if len(scores) <= max_points:
+        return scores
+    return scores[np.linspace(0, len(scores) - 1, max_points).round().astype(np.int64)]
+
+
+def build_population(path=MODEL_PATH, chunksize=DEFAULT_CHUNKSIZE, max_points=MAX_POINTS, force=False, on_chunk=None):
+    """Score the dataset with the current artifact and write the sorted scores to disk.
+
+    Does nothing if the stored scores already match both versions, unless `force`.
+    """
+    from core.data import DATA_PATH, dataset_version
+
+    out = population_path(path)
+    existing = load_population(path)
+    if (not force and existing
+            and existing["model_version"] == artifact_version(path)
+            and existing["dataset_version"] == dataset_version(DATA_PATH)):
+        return out
+    scores = score_population(get_model(path), DATA_PATH, chunksize, on_chunk)
+    # np.savez appends .npz to names without it, so write through an open file.
+    with open(out, "wb") as f:
+        np.savez(
+            f, scores=compact(scores, max_points), n_rows=len(scores),
+            model_version=artifact_version(path), dataset_version=dataset_version(DATA_PATH),
+        )
+    return out
+
+
+def load_population(path=MODEL_PATH):
+    """Read the stored scores as a dict, or return None if they have not been built yet."""
+    try:
+        with np.load(population_path(path)) as data:
+            return {
+                "scores": data["scores"],
+                "n_rows": int(data["n_rows"]),
+                "model_version": str(data["model_version"]),
+                "dataset_version": str(data["dataset_version"]),
+            }
+    except FileNotFoundError:
+        return None
+
+
+def percentile(scores, prob):
+    """Percentage of the population scored below `prob` (ties count half), by binary search."""
+    below = np.searchsorted(scores, prob, side="left")
+    at_or_below = np.searchsorted(scores, prob, side="right")
+    return 100.0 * (below + at_or_below) / (2 * len(scores))
+
+
+def distribution(scores, bins=50):
+    """Histogram of the sorted `scores` over [0, 1]: returns (edges, fraction of patients per bin)."""
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    counts = np.diff(np.searchsorted(scores, edges, side="left"))
+    counts[-1] += len(scores) - np.searchsorted(scores, 1.0, side="left")  # scores of exactly 1.0
+    return edges, counts / len(scores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score the whole dataset for population percentiles.")
+    parser.add_argument("--model", default=str(MODEL_PATH), help=f"pipeline artifact (default: {MODEL_PATH})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per model call")
+    parser.add_argument("--max-points", type=int, default=MAX_POINTS, help="maximum stored order statistics")
+    parser.add_argument("--force", action="store_true", help="rescore even if the stored scores are up to date")
+    args = parser.parse_args(argv)
+    out = build_population(args.model, args.chunksize, args.max_points, args.force,
+                           on_chunk=lambda n: print(f"scored {n:,} rows", file=sys.stderr))
+    print(f"Scores: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Bounded LRU/TTL cache of single-patient predictions.
+
+Entries are keyed on a hash of the canonicalized `build_input` row, so inputs
+that only differ in representation (45 vs 45.0, True vs 1) share an entry. The
+cache stores the model output rather than the thresholded label, so changing
+the decision threshold still hits, and it empties itself whenever the model
+artifact version changes.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from core.explain import explain as explain_rows
+from core.schema import BINARY_FEATURES, CATEGORICAL_FEATURES, FEATURES
+from core.scoring import DEFAULT_THRESHOLD, predict
+from core.telemetry import cache_miss
+
+
+def canonical_key(X):
+    """Stable hash of the first row of `X` after type normalization."""
+    row = X.iloc[0]
+    values = []
+    for col in FEATURES:
+        value = row[col]
+        if col in CATEGORICAL_FEATURES:
+            values.append(str(value))
+        elif col in BINARY_FEATURES:
+            values.append(int(value))
+        else:
+            values.append(round(float(value), 6))
+    return hashlib.sha1(json.dumps(values).encode()).hexdigest()
+
+
+class PredictionCache:
+    def __init__(self, maxsize=1024, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value, version):
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+# Shared by every session of the process.
+PREDICTION_CACHE = PredictionCache()
+
+
+def predict_one_cached(model, X, version, threshold=DEFAULT_THRESHOLD, explain=False, cache=PREDICTION_CACHE):
+    """Like `core.scoring.predict_one`, but answers repeat inputs from `cache` without inference.
+
+    Returns `(label, probability, contributions)`. With `explain=True`,
+    `contributions` is a Series of per-input-field log-odds contributions
+    computed in the same pipeline pass as the probability (None for non-XGBoost
+    models); otherwise it is None unless an earlier explained call cached it.
+    """
+    key = canonical_key(X)
+    cached = cache.get(key, version)
+    if cached is None or (explain and cached[2] is None and cached[1] is not None):
+        cache_miss()
+        if explain and hasattr(model, "predict_proba"):
+            proba, contributions, _ = explain_rows(model, X)
+            prob = float(proba[0])
+            cached = (int(prob >= DEFAULT_THRESHOLD), prob,
+                      None if contributions is None else contributions.iloc[0])
+        else:
+            labels, proba = predict(model, X, threshold)
+            cached = (int(labels[0]), None if proba is None else float(proba[0]), None)
+        cache.put(key, cached, version)
+    label, prob, contributions = cached
+    if prob is not None:
+        label = int(prob >= threshold)
+    return label, prob, contributions
@@ -0,0 +1,60 @@
+import pandas as pd
+
+# Feature schema expected by models/xgb.pkl (see README "Input Schema").
+CATEGORICAL_OPTIONS = {
+    "gender": ["Male", "Female", "Other"],
+    "ethnicity": ["Asian", "White", "Hispanic", "Black", "Other"],
+    "education_level": ["No formal", "Highschool", "Graduate", "Postgraduate"],
+    "income_level": ["Low", "Lower-Middle", "Middle", "Upper-Middle", "High"],
+    "employment_status": ["Employed", "Unemployed", "Retired", "Student"],
+    "smoking_status": ["Never", "Former", "Current"],
+}
+
+BINARY_FEATURES = ["family_history_diabetes", "hypertension_history", "cardiovascular_history"]
+
+FEATURES = [
+    # Demographic & lifestyle
+    "age", "gender", "ethnicity", "education_level", "income_level", "employment_status",
+    "smoking_status", "alcohol_consumption_per_week", "physical_activity_minutes_per_week",
+    "diet_score", "sleep_hours_per_day", "screen_time_hours_per_day",
+    # History
+    "family_history_diabetes", "hypertension_history", "cardiovascular_history",
+    # Clinical
+    "bmi", "waist_to_hip_ratio", "systolic_bp", "diastolic_bp", "heart_rate",
+    "cholesterol_total", "hdl_cholesterol", "ldl_cholesterol", "triglycerides",
+    "glucose_fasting", "glucose_postprandial", "insulin_level", "hba1c",
+]
+
+CATEGORICAL_FEATURES = [c for c in FEATURES if c in CATEGORICAL_OPTIONS]
+NUMERIC_FEATURES = [c for c in FEATURES if c not in CATEGORICAL_OPTIONS]
+
+# A typical patient (the Prediction form defaults), used e.g. to warm up the model.
+EXAMPLE_INPUT = {
+    "age": 45, "gender": "Male", "ethnicity": "Asian", "education_level": "No formal",
+    "income_level": "Low", "employment_status": "Employed", "smoking_status": "Never",
+    "alcohol_consumption_per_week": 2, "physical_activity_minutes_per_week": 150,
+    "diet_score": 6.0, "sleep_hours_per_day": 7.0, "screen_time_hours_per_day": 6.0,
+    "family_history_diabetes": False, "hypertension_history": False, "cardiovascular_history": False,
+    "bmi": 26.0, "waist_to_hip_ratio": 0.86, "systolic_bp": 120, "diastolic_bp": 80, "heart_rate": 70,
+    "cholesterol_total": 185, "hdl_cholesterol": 50, "ldl_cholesterol": 103, "triglycerides": 150,
+    "glucose_fasting": 110, "glucose_postprandial": 160, "insulin_level": 10.0, "hba1c": 6.2,
+}
+
+
+def build_input(form):
+    row = {col: form[col] for col in FEATURES}
+    for col in BINARY_FEATURES:
+        row[col] = int(row[col])
+    return pd.DataFrame([row], columns=FEATURES)
+
+
+def select_features(df):
+    """Return `df` restricted to FEATURES, in model order, or raise if columns are missing."""
+    missing = [c for c in FEATURES if c not in df.columns]
+    if missing:
+        raise ValueError(f"Input is missing required columns: {', '.join(missing)}")
+    X = df[FEATURES]
+    if X[BINARY_FEATURES].dtypes.ne("int64").any():
+        # A flag with missing values stays float (NaN), which the pipeline scores like a missing measurement.
+        X = X.astype({col: "float64" if X[col].isna().any() else "int64" for col in BINARY_FEATURES})
+    return X
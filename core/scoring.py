@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Probability at or above which a patient is labelled as diabetic.
+# Override per deployment with the PREDICTION_THRESHOLD environment variable.
+DEFAULT_THRESHOLD = float(os.environ.get("PREDICTION_THRESHOLD", 0.5))
+
+
+def predict(model, X, threshold=DEFAULT_THRESHOLD):
+    """Run the pipeline once on `X` and return `(labels, probabilities)`.
+
+    Labels are derived from the positive-class probability, so preprocessing and
+    inference happen in a single `predict_proba` call. Models without
+    `predict_proba` fall back to `predict` and return `None` for probabilities.
+    """
+    if not hasattr(model, "predict_proba"):
+        return np.asarray(model.predict(X)).astype(np.int64), None
+    proba = model.predict_proba(X)[:, 1]
+    return (proba >= threshold).astype(np.int64), proba
+
+
+def sensitivity_grid(X, grids):
+    """Copies of the one-row frame `X` with the features in `grids` swept over every combination.
+
+    `grids` maps one or two feature names to arrays of values. The result has
+    one row per grid point (the cartesian product, first feature varying slowest).
+    """
+    names = list(grids)
+    mesh = np.meshgrid(*[np.asarray(grids[n]) for n in names], indexing="ij")
+    n_points = mesh[0].size
+    out = pd.DataFrame({col: np.repeat(X[col].to_numpy(), n_points) for col in X.columns})
+    for name, values in zip(names, mesh):
+        out[name] = values.ravel()
+    return out
+
+
+def sensitivity(model, X, grids):
+    """Risk over a one- or two-feature grid around patient `X`, scored in one predict_proba call.
+
+    Returns the grid columns plus `probability`.
+    """
+    grid = sensitivity_grid(X, grids)
+    out = grid[list(grids)].copy()
+    out["probability"] = model.predict_proba(grid)[:, 1]
+    return out
+
+
+def predict_one(model, X, threshold=DEFAULT_THRESHOLD):
+    """Single-row convenience wrapper around `predict` returning `(label, probability)`."""
+    labels, proba = predict(model, X, threshold)
+    return int(labels[0]), (float(proba[0]) if proba is not None else None)
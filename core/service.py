@@ -0,0 +1,279 @@
+"""Local HTTP scoring service with dynamic micro-batching.
+
+Endpoints (JSON in, JSON out):
+    GET  /health          -> {"status": "ok", "model_version": ...}
+    GET  /drift           -> {"window": {...}, "features": [{"feature", "psi", "ks", ...}, ...]}
+    POST /predict         body: one patient object with the build_input fields
+                          -> {"prediction": 0|1, "probability": float}
+    POST /predict/batch   body: {"instances": [patient, ...]} (or a bare list)
+                          -> {"predictions": [{"prediction": ..., "probability": ...}, ...]}
+
+Concurrent requests are queued and merged for up to `--max-wait-ms` (or until
+`--max-batch` rows) into one DataFrame that is scored with a single pipeline
+pass in a worker thread, so throughput scales with the vectorized model call
+rather than with per-request overhead.
+
+Usage:
+    python -m core.service --port 8000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from http import HTTPStatus
+
+import pandas as pd
+
+from core.drift import MONITOR, load_reference
+from core.model import MODEL_PATH, artifact_version, get_model
+from core.schema import FEATURES, select_features
+from core.scoring import DEFAULT_THRESHOLD, predict
+
+log = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _validate_record(record):
+    if not isinstance(record, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "Each patient must be a JSON object")
+    missing = [c for c in FEATURES if c not in record]
+    if missing:
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Missing fields: {', '.join(missing)}")
+    return {c: record[c] for c in FEATURES}
+
+
+class MicroBatcher:
+    """Collects records from concurrent callers and scores them together."""
+
+    def __init__(self, model_path=MODEL_PATH, max_batch=256, max_wait_ms=5.0, threshold=DEFAULT_THRESHOLD):
+        self.model_path = model_path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.threshold = threshold
+        self._queue = asyncio.Queue()
+        self._worker = None
+        self.batches = 0
+        self.rows = 0
+
+    def start(self):
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+
+    async def submit(self, records):
+        """Queue a list of validated records and wait for their (label, probability) results."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((records, future))
+        return await future
+
+    async def _collect(self, items):
+        # Block for the first request, then keep taking requests into `items` until the window or batch is full.
+        items.append(await self._queue.get())
+        n_rows = len(items[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while n_rows < self.max_batch:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+
+    def _score(self, records):
+        X = select_features(pd.DataFrame.from_records(records, columns=FEATURES))
+        labels, proba = predict(get_model(self.model_path), X, self.threshold)
+        MONITOR.add(X, proba)
+        return labels, proba
+
+    @staticmethod
+    def _results(labels, proba, start, end):
+        return [
+            {"prediction": int(labels[i]), "probability": None if proba is None else float(proba[i])}
+            for i in range(start, end)
+        ]
+
+    async def _run(self):
+        while True:
+            items = []
+            try:
+                await self._collect(items)
+                await self._process(items)
+            except Exception as e:
+                # Keep the worker alive: fail the requests taken so far instead of leaving them waiting forever.
+                log.exception("Micro-batch failed")
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(RequestError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Scoring failed: {e}"))
+
+    async def _process(self, items):
+        loop = asyncio.get_running_loop()
+        records = [r for batch, _ in items for r in batch]
+        try:
+            labels, proba = await loop.run_in_executor(None, self._score, records)
+        except Exception:
+            # One bad request must not fail the others merged with it: rescore them separately.
+            for batch, future in items:
+                try:
+                    labels, proba = await loop.run_in_executor(None, self._score, batch)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(RequestError(HTTPStatus.UNPROCESSABLE_ENTITY, f"Scoring failed: {e}"))
+                    continue
+                if not future.done():
+                    future.set_result(self._results(labels, proba, 0, len(batch)))
+            return
+        self.batches += 1
+        self.rows += len(records)
+        start = 0
+        for batch, future in items:
+            end = start + len(batch)
+            if not future.done():
+                future.set_result(self._results(labels, proba, start, end))
+            start = end
+
+
+class ScoringService:
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "model_version": artifact_version(self.batcher.model_path),
+                "batches": self.batcher.batches,
+                "rows": self.batcher.rows,
+            }
+        if method == "GET" and path == "/drift":
+            # The reference profile is read (or built from the dataset statistics) once per process.
+            if MONITOR.reference is None:
+                MONITOR.attach(await asyncio.get_running_loop().run_in_executor(None, load_reference))
+            report = MONITOR.report()
+            return HTTPStatus.OK, {
+                "window": MONITOR.stats(),
+                "features": report.astype(object).where(report.notna(), None).to_dict("records"),
+            }
+        if method != "POST" or path not in ("/predict", "/predict/batch"):
+            raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON") from None
+        if path == "/predict":
+            results = await self.batcher.submit([_validate_record(payload)])
+            return HTTPStatus.OK, results[0]
+        instances = payload.get("instances") if isinstance(payload, dict) else payload
+        if not isinstance(instances, list):
+            raise RequestError(HTTPStatus.BAD_REQUEST, 'Expected {"instances": [...]} or a JSON list')
+        if not instances:
+            return HTTPStatus.OK, {"predictions": []}
+        results = await self.batcher.submit([_validate_record(r) for r in instances])
+        return HTTPStatus.OK, {"predictions": results}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Invalid Content-Length"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, payload = await self.handle(method, target.split("?", 1)[0], body)
+                except RequestError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    log.exception("Scoring request failed")
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8000, model_path=MODEL_PATH, max_batch=256, max_wait_ms=5.0,
+                threshold=DEFAULT_THRESHOLD):
+    get_model(model_path)  # load, validate and warm up before accepting traffic
+    batcher = MicroBatcher(model_path, max_batch, max_wait_ms, threshold)
+    batcher.start()
+    service = ScoringService(batcher)
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    log.info("Scoring service listening on http://%s:%d", host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP scoring service for the diabetes prediction pipeline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default=str(MODEL_PATH), help=f"pipeline artifact (default: {MODEL_PATH})")
+    parser.add_argument("--max-batch", type=int, default=256, help="maximum rows merged into one model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="how long to wait for more requests to batch")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"probability cut-off for prediction=1 (default: {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(serve(args.host, args.port, args.model, args.max_batch, args.max_wait_ms, args.threshold))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
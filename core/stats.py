@@ -0,0 +1,484 @@
+"""One-pass, mergeable statistics of the dataset for the Overview and Insights pages.
+
+The dataset is read in chunks (Parquet cache batches when the cache exists,
+otherwise CSV chunks), and each chunk is folded into a `DatasetStats`:
+  - per-column count/mean/variance/min/max (Chan's parallel update)
+  - the co-moment matrix of the numeric columns, for Pearson correlations
+  - per-status counts of every distinct numeric value, from which exact
+    quantiles, histograms, box statistics and value counts are derived
+  - per-status category counts and joint (x, y) counts for density grids
+  - a bottom-k random sample per status for scatter plots
+
+Memory depends on the number of distinct values, not rows: a column with more
+than `max_bins` distinct values is coarsened onto an even grid, after which its
+quantiles and histograms are approximate to within one grid step. The result is
+pickled beside the Parquet cache, keyed on the dataset version and on
+`STATS_FORMAT` and the sample size, so a pickle written by other code is rebuilt:
+    python -m core.stats --chunksize 200000
+"""
+import argparse
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.data import CACHE_DIR, DATA_PATH, add_derived_columns, cache_path, dataset_version, read_csv
+
+# Bump whenever DatasetStats/ValueCounts or the binning and quantile parameters change.
+STATS_FORMAT = 1
+DEFAULT_CHUNKSIZE = 200_000
+MAX_BINS = 1 << 16
+PREVIEW_ROWS = 10
+# Rows kept per status for the Insights scatter; matches that page's point budget.
+SAMPLE_SIZE = int(os.environ.get("SCATTER_POINT_BUDGET", 5000))
+TARGET = "diagnosed_diabetes"
+STATUS_LABELS = {0: "No", 1: "Yes"}
+
+
+def _status(codes):
+    return pd.Series(codes).map(STATUS_LABELS).to_numpy()
+
+
+class ValueCounts:
+    """Mergeable counts of distinct `ndim`-dimensional values, coarsened to at most `max_bins` keys."""
+
+    def __init__(self, ndim=1, max_bins=MAX_BINS):
+        self.max_bins = max_bins
+        self.keys = np.empty((0, ndim))
+        self.counts = np.empty(0)
+        self.step = np.zeros(ndim)  # 0 = exact; otherwise values are bucket midpoints
+
+    @property
+    def exact(self):
+        return not self.step.any()
+
+    @property
+    def total(self):
+        return self.counts.sum()
+
+    def _quantize(self, keys):
+        step = np.where(self.step > 0, self.step, 1.0)
+        return np.where(self.step > 0, np.floor(keys / step) * step + step / 2, keys)
+
+    def update(self, keys, counts=None):
+        keys = np.asarray(keys, dtype=float).reshape(len(keys), -1)
+        counts = np.ones(len(keys)) if counts is None else np.asarray(counts, dtype=float)
+        keep = np.isfinite(keys).all(axis=1)
+        keys, counts = self._quantize(keys[keep]), counts[keep]
+        # Collapse the chunk by hashing first, so only its distinct values reach the sort in `_add`.
+        codes = np.zeros(len(keys), dtype=np.int64)
+        for dim in range(keys.shape[1]):
+            dim_codes, uniques = pd.factorize(keys[:, dim])
+            codes = codes * len(uniques) + dim_codes
+        codes, uniques = pd.factorize(codes)
+        rows = np.empty(len(uniques), dtype=np.int64)
+        rows[codes] = np.arange(len(codes))  # any row of each distinct key
+        self._add(keys[rows], np.bincount(codes, weights=counts, minlength=len(uniques)))
+        return self
+
+    def merge(self, other):
+        if other.step.any() or self.step.any():
+            self.step = np.maximum(self.step, other.step)
+            self.keys = self._quantize(self.keys)
+        self._add(self._quantize(other.keys), other.counts)
+        return self
+
+    def _add(self, keys, counts):
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        if keys.shape[1] == 1:
+            unique, inverse = np.unique(keys[:, 0], return_inverse=True)
+            unique = unique[:, None]
+        else:
+            unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        self.keys = unique
+        self.counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(unique))
+        while len(self.keys) > self.max_bins:
+            self._coarsen()
+
+    def _coarsen(self):
+        # Double the grid step (or start one at ~max_bins/2 cells per dimension) and re-bucket.
+        span = self.keys.max(axis=0) - self.keys.min(axis=0)
+        cells = (self.max_bins / 2) ** (1 / self.keys.shape[1])
+        self.step = np.where(self.step > 0, 2 * self.step, np.where(span > 0, span / cells, 1.0))
+        keys, counts = self._quantize(self.keys), self.counts
+        self.keys, self.counts = np.empty((0, keys.shape[1])), np.empty(0)
+        self._add(keys, counts)
+
+    def values(self, dim=0):
+        return self.keys[:, dim]
+
+    def quantile(self, q):
+        """Linear-interpolation quantiles, as `pd.Series.quantile` computes them."""
+        values = self.keys[:, 0]
+        cum = np.cumsum(self.counts)
+        h = (cum[-1] - 1) * np.asarray(q, dtype=float)
+        lo = np.floor(h)
+        v_lo = values[np.searchsorted(cum, lo, side="right")]
+        v_hi = values[np.searchsorted(cum, np.minimum(lo + 1, cum[-1] - 1), side="right")]
+        return v_lo + (h - lo) * (v_hi - v_lo)
+
+    def mean(self):
+        return float((self.keys[:, 0] * self.counts).sum() / self.counts.sum())
+
+
+def _merged(counts):
+    out = None
+    for vc in counts:
+        out = (ValueCounts(vc.keys.shape[1], vc.max_bins) if out is None else out).merge(vc)
+    return out
+
+
+class DatasetStats:
+    """Accumulates the page summaries over chunks of the dataset; see the module docstring."""
+
+    def __init__(self, by=TARGET, pairs=(("age", "hba1c"),), sample_size=SAMPLE_SIZE, max_bins=MAX_BINS, seed=0):
+        self.by = by
+        self.pairs = [tuple(p) for p in pairs]
+        self.sample_size = sample_size
+        self.max_bins = max_bins
+        self.rng = np.random.default_rng(seed)
+        self.n_rows = 0
+        self.columns = None  # dataset columns, without the derived ones
+        self.dtypes = {}
+        self.preview = None
+        self.numeric = None
+        self.moments = None  # count, mean, M2, min, max per numeric column
+        self.comoments = None  # n, mean vector, co-moment matrix over complete rows
+        self.values = {}  # numeric column -> status code -> ValueCounts
+        self.categories = {}  # categorical column -> Series of counts indexed by (value, status code)
+        self.category_order = {}
+        self.joint = {}  # (x, y) -> status code -> ValueCounts(ndim=2)
+        self.sample = None  # bottom-k rows per status by random key
+
+    def update(self, chunk):
+        """Fold one chunk of raw dataset rows into the statistics."""
+        if self.columns is None:
+            self._init(chunk)
+        else:
+            self._update_dtypes(chunk)
+        chunk = add_derived_columns(chunk.reset_index(drop=True))
+        status = chunk[self.by].to_numpy()
+        self._update_moments(chunk[self.numeric].to_numpy(dtype=float))
+        for col in self.numeric:
+            values = chunk[col].to_numpy(dtype=float)
+            for code in np.unique(status):
+                self.values[col].setdefault(code, ValueCounts(1, self.max_bins)).update(values[status == code])
+        for col in self.categories:
+            counts = chunk.groupby([chunk[col], self.by], observed=True).size().astype(float)
+            counts.index = counts.index.set_levels(counts.index.levels[0].astype(str), level=0)
+            previous = self.categories[col]
+            self.categories[col] = counts if previous is None else previous.add(counts, fill_value=0)
+            for value in chunk[col].cat.categories if hasattr(chunk[col], "cat") else counts.index.levels[0]:
+                if str(value) not in self.category_order[col]:
+                    self.category_order[col].append(str(value))
+        for x, y in self.pairs:
+            xy = chunk[[x, y]].to_numpy(dtype=float)
+            for code in np.unique(status):
+                self.joint[(x, y)].setdefault(code, ValueCounts(2, self.max_bins)).update(xy[status == code])
+        self._update_sample(chunk)
+        self.n_rows += len(chunk)
+        return self
+
+    def _init(self, chunk):
+        self.columns = list(chunk.columns)
+        self.dtypes = {col: str(dtype) for col, dtype in chunk.dtypes.items()}
+        self.preview = chunk.head(PREVIEW_ROWS).copy()
+        self.numeric = list(chunk.select_dtypes(include=[np.number]).columns)
+        p = len(self.numeric)
+        self.moments = {"count": np.zeros(p), "mean": np.zeros(p), "M2": np.zeros(p),
+                        "min": np.full(p, np.inf), "max": np.full(p, -np.inf)}
+        self.comoments = {"n": 0, "mean": np.zeros(p), "C": np.zeros((p, p))}
+        self.values = {col: {} for col in self.numeric}
+        categorical = [c for c in self.columns if c not in self.numeric] + ["BMI Category"]
+        self.categories = {col: None for col in categorical}
+        self.category_order = {col: [] for col in categorical}
+        self.joint = {pair: {} for pair in self.pairs}
+
+    def _update_dtypes(self, chunk):
+        # A column can parse as int in one CSV chunk and float (NaN) in another.
+        for col, dtype in chunk.dtypes.items():
+            old = self.dtypes[col]
+            if str(dtype) != old and old != "category" and str(dtype) != "category":
+                self.dtypes[col] = str(np.promote_types(old, dtype))
+
+    def _update_moments(self, X):
+        m = self.moments
+        finite = np.isfinite(X)
+        n_b = finite.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_b = np.where(n_b > 0, np.nansum(X, axis=0) / n_b, 0.0)
+            m2_b = np.nansum((X - mean_b) ** 2, axis=0)
+            n = m["count"] + n_b
+            delta = mean_b - m["mean"]
+            m["mean"] = np.where(n > 0, m["mean"] + delta * n_b / n, 0.0)
+            m["M2"] = np.where(n > 0, m["M2"] + m2_b + delta ** 2 * m["count"] * n_b / n, 0.0)
+        m["count"] = n
+        m["min"] = np.fmin(m["min"], np.where(finite, X, np.inf).min(axis=0, initial=np.inf))
+        m["max"] = np.fmax(m["max"], np.where(finite, X, -np.inf).max(axis=0, initial=-np.inf))
+
+        c = self.comoments
+        Y = X[finite.all(axis=1)]
+        if len(Y):
+            n_b, mean_b = len(Y), Y.mean(axis=0)
+            D = Y - mean_b
+            n = c["n"] + n_b
+            delta = mean_b - c["mean"]
+            c["C"] = c["C"] + D.T @ D + np.outer(delta, delta) * c["n"] * n_b / n
+            c["mean"] = c["mean"] + delta * n_b / n
+            c["n"] = n
+
+    def _update_sample(self, chunk):
+        if not self.sample_size:
+            return
+        cols = list(dict.fromkeys([c for pair in self.pairs for c in pair] + ["diagnosed_diabetes_str", self.by]))
+        rows = chunk[cols].copy()
+        rows["_key"] = self.rng.random(len(rows))
+        rows["_row"] = np.arange(self.n_rows, self.n_rows + len(rows))
+        pool = rows if self.sample is None else pd.concat([self.sample, rows], ignore_index=True)
+        self.sample = pool.sort_values("_key").groupby(self.by, observed=True).head(self.sample_size)
+
+    def merge(self, other):
+        """Combine with statistics of another part of the same dataset (e.g. from another worker)."""
+        if other.columns is None:
+            return self
+        if self.columns is None:
+            self.__dict__.update(other.__dict__)
+            return self
+        a, b = self.moments, other.moments
+        n = a["count"] + b["count"]
+        delta = b["mean"] - a["mean"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            a["mean"] = np.where(n > 0, a["mean"] + delta * b["count"] / n, 0.0)
+            a["M2"] = np.where(n > 0, a["M2"] + b["M2"] + delta ** 2 * a["count"] * b["count"] / n, 0.0)
+        a["count"] = n
+        a["min"], a["max"] = np.fmin(a["min"], b["min"]), np.fmax(a["max"], b["max"])
+        ca, cb = self.comoments, other.comoments
+        if cb["n"]:
+            n = ca["n"] + cb["n"]
+            delta = cb["mean"] - ca["mean"]
+            ca["C"] = ca["C"] + cb["C"] + np.outer(delta, delta) * ca["n"] * cb["n"] / n
+            ca["mean"] = ca["mean"] + delta * cb["n"] / n
+            ca["n"] = n
+        for table, other_table in ((self.values, other.values), (self.joint, other.joint)):
+            for key, by_status in other_table.items():
+                for code, vc in by_status.items():
+                    mine = table[key].get(code)
+                    table[key][code] = vc if mine is None else mine.merge(vc)
+        for col, counts in other.categories.items():
+            if counts is not None:
+                previous = self.categories[col]
+                self.categories[col] = counts if previous is None else previous.add(counts, fill_value=0)
+            self.category_order[col] += [v for v in other.category_order[col] if v not in self.category_order[col]]
+        shifted = other.sample.assign(_row=other.sample["_row"] + self.n_rows)
+        self.sample = (pd.concat([self.sample, shifted], ignore_index=True).sort_values("_key")
+                       .groupby(self.by, observed=True).head(self.sample_size))
+        self.n_rows += other.n_rows
+        return self
+
+    # ---- Overview ----
+
+    def mean(self, col):
+        return float(self.moments["mean"][self.numeric.index(col)])
+
+    def dtypes_table(self):
+        return pd.DataFrame({"column": self.columns, "dtype": [self.dtypes[c] for c in self.columns]},
+                            index=self.columns)
+
+    def describe(self):
+        """Same layout as `df.select_dtypes(include=[np.number]).describe().T`."""
+        m = self.moments
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.sqrt(m["M2"] / (m["count"] - 1))
+        quartiles = []
+        for col in self.numeric:
+            merged = _merged(self.values[col].values())
+            quartiles.append(merged.quantile([0.25, 0.5, 0.75]) if merged is not None and merged.total
+                             else [np.nan] * 3)
+        quartiles = np.asarray(quartiles, dtype=float).reshape(len(self.numeric), 3)
+        return pd.DataFrame({
+            "count": m["count"], "mean": m["mean"], "std": std, "min": m["min"],
+            "25%": quartiles[:, 0], "50%": quartiles[:, 1], "75%": quartiles[:, 2], "max": m["max"],
+        }, index=self.numeric)
+
+    # ---- Insights tables ----
+
+    def _cast(self, col, values):
+        dtype = self.dtypes.get(col)
+        return values.astype(dtype) if dtype and dtype.startswith("int") else values
+
+    def status_counts(self):
+        """Row counts per diabetes status: columns [status, count]."""
+        codes = sorted(self.values[self.by])
+        counts = [int(self.values[self.by][c].total) for c in codes]
+        return pd.DataFrame({"status": _status(codes), "count": counts})
+
+    def category_counts(self, col):
+        """Row counts per `col` value and diabetes status: columns [col, count, status]."""
+        if col in self.values:
+            frames = [pd.DataFrame({col: self._cast(col, vc.values()), self.by: code, "count": vc.counts.astype(np.int64)})
+                      for code, vc in self.values[col].items()]
+            counts = pd.concat(frames, ignore_index=True).sort_values([col, self.by], ignore_index=True)
+        else:
+            counts = self.categories[col].astype(np.int64).rename("count").rename_axis([col, self.by]).reset_index()
+            rank = {v: i for i, v in enumerate(self.category_order[col])}
+            counts = counts.sort_values([col, self.by], key=lambda s: s.map(rank) if s.name == col else s,
+                                        ignore_index=True)
+        counts["status"] = _status(counts[self.by])
+        return counts.drop(columns=self.by)
+
+    def value_counts(self, col):
+        """Row counts per distinct `col` value, in value (or category) order: columns [col, count]."""
+        if col in self.values:
+            merged = _merged(self.values[col].values())
+            return pd.DataFrame({col: self._cast(col, merged.values()), "count": merged.counts.astype(np.int64)})
+        counts = self.categories[col].groupby(level=0).sum().astype(np.int64)
+        counts = counts.reindex([v for v in self.category_order[col] if v in counts.index])
+        return counts.rename_axis(col).rename("count").reset_index()
+
+    def histogram(self, col, nbins, by=TARGET):
+        """Equal-width histogram of `col` with edges shared across statuses.
+
+        Returns columns [bin_left, bin_right, bin_mid, count] plus `status` when `by` is set.
+        """
+        i = self.numeric.index(col)
+        edges = np.histogram_bin_edges(np.array([self.moments["min"][i], self.moments["max"][i]]), bins=nbins)
+        table = pd.DataFrame({"bin_left": edges[:-1], "bin_right": edges[1:]})
+        table["bin_mid"] = (table["bin_left"] + table["bin_right"]) / 2
+        codes = sorted(self.values[col])
+        counts = []
+        for code in codes:
+            vc = self.values[col][code]
+            bins = np.clip(np.searchsorted(edges, vc.values(), side="right") - 1, 0, nbins - 1)
+            counts.append(np.bincount(bins, weights=vc.counts, minlength=nbins).astype(np.int64))
+        if by is None:
+            table["count"] = np.sum(counts, axis=0)
+            return table
+        if by != self.by:
+            raise ValueError(f"Statistics were accumulated by {self.by!r}, not {by!r}")
+        table = pd.concat([table] * len(codes), ignore_index=True)
+        table["status"] = np.repeat(_status(codes), nbins)
+        table["count"] = np.concatenate(counts)
+        return table
+
+    def histogram2d(self, x, y, nbins):
+        """2D histogram of (`x`, `y`) per status on shared edges: columns [status, x_mid, y_mid, count]."""
+        by_status = self.joint[(x, y)]
+        codes = sorted(by_status)
+        keys = np.concatenate([by_status[c].keys for c in codes])
+        mids, edges = [], []
+        for dim in range(2):
+            e = np.histogram_bin_edges(np.array([keys[:, dim].min(), keys[:, dim].max()]), bins=nbins)
+            edges.append(e)
+            mids.append((e[:-1] + e[1:]) / 2)
+        counts = []
+        for code in codes:
+            vc = by_status[code]
+            bx, by_ = (np.clip(np.searchsorted(edges[d], vc.keys[:, d], side="right") - 1, 0, nbins - 1)
+                       for d in range(2))
+            counts.append(np.bincount(bx * nbins + by_, weights=vc.counts, minlength=nbins * nbins))
+        return pd.DataFrame({
+            "status": np.repeat(_status(codes), nbins * nbins),
+            "x_mid": np.tile(np.repeat(mids[0], nbins), len(codes)),
+            "y_mid": np.tile(mids[1], nbins * len(codes)),
+            "count": np.concatenate(counts).astype(np.int64),
+        })
+
+    def stratified_sample(self, cols, n):
+        """At most ~`n` rows of `cols`, sampled within each status in proportion to its size.
+
+        Rows come from the per-status random sample kept while streaming, so the
+        class balance of the sample matches the full dataset.
+        """
+        if self.n_rows <= n and self.n_rows <= self.sample_size:
+            return self.sample.sort_values("_row").set_index("_row")[cols].rename_axis(None)
+        frac = min(1.0, n / self.n_rows)
+        sizes = self.status_counts().set_index("status")["count"]
+        picks = [rows.head(max(1, round(sizes[STATUS_LABELS[code]] * frac)))
+                 for code, rows in self.sample.groupby(self.by, observed=True)]
+        return pd.concat(picks).sort_values("_row").set_index("_row")[cols].rename_axis(None)
+
+    def box_stats(self, col):
+        """Tukey box-plot statistics of `col` per status; fences are the extreme values within 1.5 IQR."""
+        rows = []
+        for code in sorted(self.values[col]):
+            vc = self.values[col][code]
+            q1, median, q3 = vc.quantile([0.25, 0.5, 0.75])
+            iqr = q3 - q1
+            values = vc.values()
+            inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+            rows.append({"q1": q1, "median": median, "q3": q3, "mean": vc.mean(), "n": int(vc.total),
+                         "lowerfence": inside.min(), "upperfence": inside.max(), "status": STATUS_LABELS[code]})
+        return pd.DataFrame(rows)
+
+    def correlation(self, cols):
+        """Pearson correlation matrix of `cols` over the rows where every numeric column is present."""
+        idx = [self.numeric.index(c) for c in cols]
+        C = self.comoments["C"][np.ix_(idx, idx)]
+        d = np.sqrt(np.diag(C))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = np.clip(C / np.outer(d, d), -1, 1)
+        np.fill_diagonal(corr, 1.0)
+        return pd.DataFrame(corr, index=cols, columns=cols)
+
+
+def iter_dataset(path=DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, version=None, columns=None):
+    """Yield the dataset (or only `columns` of it) in DataFrame chunks, from the Parquet cache if built, otherwise the CSV."""
+    parquet = cache_path(path, version)
+    if parquet.exists():
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(parquet).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    with read_csv(path, chunksize=chunksize, usecols=columns) as reader:
+        yield from reader
+
+
+def compute_stats(path=DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, version=None, **kwargs):
+    stats = DatasetStats(**kwargs)
+    for chunk in iter_dataset(path, chunksize, version):
+        stats.update(chunk)
+    return stats
+
+
+def stats_path(path=DATA_PATH, version=None):
+    path = Path(path)
+    return CACHE_DIR / f"{path.stem}-{version or dataset_version(path)}-v{STATS_FORMAT}-s{SAMPLE_SIZE}.stats.pkl"
+
+
+def load_stats(path=DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Statistics of the current dataset version, computed in one chunked pass on first use."""
+    version = dataset_version(path)
+    target = stats_path(path, version)
+    if target.exists():
+        try:
+            with open(target, "rb") as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError, ValueError):
+            pass  # written by incompatible code or truncated: rebuild it
+    stats = compute_stats(path, chunksize, version)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(f".pkl.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump(stats, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, target)
+    for stale in CACHE_DIR.glob(f"{Path(path).stem}-*.stats.pkl"):
+        if stale != target:
+            stale.unlink(missing_ok=True)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the dataset statistics in one chunked pass.")
+    parser.add_argument("--data", default=str(DATA_PATH), help=f"dataset CSV (default: {DATA_PATH})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk")
+    args = parser.parse_args(argv)
+    stats = load_stats(args.data, args.chunksize)
+    print(f"{stats.n_rows:,} rows, {len(stats.columns)} columns -> {stats_path(args.data)}")
+
+
+if __name__ == "__main__":
+    main()
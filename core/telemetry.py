@@ -0,0 +1,218 @@
+"""Timing spans for the dashboard's hot paths.
+
+`span("name")` times a block and records it in a process-wide registry that
+keeps the most recent samples per span name. Cached loaders call `cache_miss()`
+from inside their body, so the enclosing `span(..., cached=True)` knows whether
+the cache answered. `summary()` gives per-span p50/p95 and hit rates for the
+debug sidebar panel (open any page with `?debug=1`, or set DASHBOARD_DEBUG=1).
+
+Every finished span is also logged as one JSON line on the `core.telemetry`
+logger; set TELEMETRY_LOG=path to append them to a file, then summarize with:
+    python -m core.telemetry telemetry.log
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+MAX_SAMPLES = 1000  # per span name
+
+log = logging.getLogger(__name__)
+if os.environ.get("TELEMETRY_LOG"):
+    _handler = logging.FileHandler(os.environ["TELEMETRY_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_handler)
+    log.setLevel(logging.INFO)
+
+_local = threading.local()
+
+
+def _percentiles(samples):
+    ms = 1000 * np.asarray(samples)
+    return {
+        "count": len(ms),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "mean_ms": float(ms.mean()),
+        "total_ms": float(ms.sum()),
+    }
+
+
+class SpanRegistry:
+    def __init__(self, max_samples=MAX_SAMPLES, emit=True):
+        self.emit = emit
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, cache_hit=None, **tags):
+        with self._lock:
+            self._samples[name].append(seconds)
+            if cache_hit is True:
+                self._hits[name] += 1
+            elif cache_hit is False:
+                self._misses[name] += 1
+        if self.emit and log.isEnabledFor(logging.INFO):
+            log.info(json.dumps({"ts": time.time(), "span": name, "ms": round(1000 * seconds, 3),
+                                 "cache_hit": cache_hit, **tags}, default=str))
+
+    def summary(self):
+        """One dict per span name (slowest total first) with count, p50/p95/mean/total ms and cache hits."""
+        with self._lock:
+            names = list(self._samples)
+            rows = []
+            for name in names:
+                hits, misses = self._hits[name], self._misses[name]
+                rows.append({
+                    "span": name,
+                    **_percentiles(list(self._samples[name])),
+                    "cache_hits": hits,
+                    "cache_misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else None,
+                })
+        return sorted(rows, key=lambda r: r["total_ms"], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._hits.clear()
+            self._misses.clear()
+
+
+# Shared by every session of the process.
+REGISTRY = SpanRegistry()
+
+
+@contextmanager
+def span(name, cached=False, registry=REGISTRY, **tags):
+    """Time the enclosed block as `name`.
+
+    With `cached=True` the block is counted as a cache hit unless `cache_miss()`
+    is called while it runs. Extra keyword arguments are added to the log line.
+    """
+    stack = _local.__dict__.setdefault("stack", [])
+    state = {"cached": cached, "hit": True}
+    stack.append(state)
+    start = time.perf_counter()
+    try:
+        yield state
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        registry.record(name, seconds, state["hit"] if cached else None, **tags)
+
+
+def cache_miss():
+    """Mark the innermost open `cached=True` span as a miss; call it from inside a cached function's body."""
+    for state in reversed(getattr(_local, "stack", [])):
+        if state["cached"]:
+            state["hit"] = False
+            return
+
+
+def traced(name, cached=False):
+    """Decorator form of `span`; put it above `st.cache_data` so cache hits are timed too."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, cached=cached):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Stopwatch:
+    """Times consecutive stretches of a script: `lap(name)` records the time since the previous lap."""
+
+    def __init__(self, registry=REGISTRY):
+        self.registry = registry
+        self.reset()
+
+    def reset(self):
+        self.mark = time.perf_counter()
+
+    def lap(self, name, **tags):
+        now = time.perf_counter()
+        self.registry.record(name, now - self.mark, **tags)
+        self.mark = now
+
+
+def summary(registry=REGISTRY):
+    return registry.summary()
+
+
+def snapshot(registry=REGISTRY):
+    """The current per-span summary as a JSON-serializable metrics document."""
+    return {"ts": time.time(), "pid": os.getpid(), "spans": registry.summary()}
+
+
+def export(path, registry=REGISTRY):
+    """Write `snapshot()` to `path`."""
+    with open(path, "w") as f:
+        json.dump(snapshot(registry), f, indent=2)
+
+
+def summarize_log(path):
+    """Per-span summary rebuilt from a TELEMETRY_LOG file of JSON lines."""
+    registry = SpanRegistry(max_samples=None, emit=False)
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            registry.record(entry["span"], entry["ms"] / 1000, entry.get("cache_hit"))
+    return registry.summary()
+
+
+def debug_enabled():
+    import streamlit as st
+
+    return os.environ.get("DASHBOARD_DEBUG") == "1" or st.query_params.get("debug") == "1"
+
+
+def debug_panel(registry=REGISTRY):
+    """Sidebar table of span timings for this process; shown only when debugging is enabled."""
+    if not debug_enabled():
+        return
+    import pandas as pd
+    import streamlit as st
+
+    with st.sidebar.expander("⏱ Timings", expanded=True):
+        metrics = snapshot(registry)
+        if not metrics["spans"]:
+            st.caption("No spans recorded yet.")
+            return
+        table = pd.DataFrame(metrics["spans"]).set_index("span")
+        st.dataframe(
+            table[["count", "p50_ms", "p95_ms", "total_ms", "hit_rate"]].round(2),
+            use_container_width=True
+        )
+        st.download_button("Download metrics", json.dumps(metrics, indent=2),
+                           file_name="timings.json", mime="application/json")
+        if st.button("Reset timings"):
+            registry.clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a TELEMETRY_LOG file into per-span percentiles.")
+    parser.add_argument("log", help="file written with TELEMETRY_LOG=path")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+    rows = summarize_log(args.log)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'span':48} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'total ms':>10} {'hit rate':>8}")
+    for r in rows:
+        hit_rate = "" if r["hit_rate"] is None else f"{r['hit_rate']:.0%}"
+        print(f"{r['span'][:48]:48} {r['count']:7d} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['total_ms']:10.1f} {hit_rate:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Train and evaluate the ColumnTransformer + SMOTE + XGBoost pipeline.
+
+Stratified cross-validation folds are fitted in parallel worker processes
+(XGBoost `hist` trees, CPU threads split between workers), and the pooled
+out-of-fold probabilities give ROC and precision-recall curves, a calibration
+curve and a decision-threshold table. The pipeline is then refitted on all
+rows and saved as models/xgb.pkl, and the evaluation is written beside it as
+models/xgb.evaluation.json for the Overview page to read. An evaluate-only run
+writes models/xgb.candidate.evaluation.json instead and leaves both untouched.
+
+Usage:
+    python -m core.train --folds 5 --workers 4
+    python -m core.train --no-save          # evaluate only (models/xgb.candidate.evaluation.json)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from core.model import MODEL_PATH, artifact_version
+from core.schema import CATEGORICAL_FEATURES, NUMERIC_FEATURES, select_features
+
+TARGET = "diagnosed_diabetes"
+DEFAULT_PARAMS = {
+    "n_estimators": 300,
+    "max_depth": 6,
+    "learning_rate": 0.1,
+    "subsample": 0.9,
+    "colsample_bytree": 0.8,
+}
+CURVE_POINTS = 200
+THRESHOLDS = np.round(np.arange(0.05, 0.96, 0.05), 2)
+
+
+def evaluation_path(path=MODEL_PATH, saved=True):
+    # Evaluate-only runs get their own report, so the deployed artifact's report is never overwritten.
+    return Path(path).with_suffix(".evaluation.json" if saved else ".candidate.evaluation.json")
+
+
+def make_pipeline(params=None, seed=0, n_jobs=None):
+    """Unfitted preprocessing + SMOTE + XGBoost pipeline for the `build_input` schema."""
+    from imblearn.over_sampling import SMOTE
+    from imblearn.pipeline import Pipeline
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+    from xgboost import XGBClassifier
+
+    preprocess = ColumnTransformer([
+        ("num", StandardScaler(), NUMERIC_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+    ])
+    model = XGBClassifier(**{**DEFAULT_PARAMS, **(params or {})}, tree_method="hist",
+                          eval_metric="logloss", random_state=seed, n_jobs=n_jobs)
+    return Pipeline([("preprocess", preprocess), ("smote", SMOTE(random_state=seed)), ("model", model)])
+
+
+# Training data of a worker process, sent once through the pool initializer.
+_worker_data = {}
+
+
+def _init_worker(X, y):
+    _worker_data["X"], _worker_data["y"] = X, y
+
+
+def _fit_fold(fold, train_idx, valid_idx, params, seed, n_jobs):
+    X, y = _worker_data["X"], _worker_data["y"]
+    start = time.perf_counter()
+    pipeline = make_pipeline(params, seed, n_jobs).fit(X.iloc[train_idx], y[train_idx])
+    proba = pipeline.predict_proba(X.iloc[valid_idx])[:, 1]
+    return fold, valid_idx, proba, time.perf_counter() - start
+
+
+def cross_validate(X, y, folds=5, workers=None, params=None, seed=0):
+    """Out-of-fold probabilities for every row, plus per-fold fit times, with folds in a process pool."""
+    from sklearn.model_selection import StratifiedKFold
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, folds))
+    n_jobs = max(1, cpus // workers)
+    splits = StratifiedKFold(folds, shuffle=True, random_state=seed).split(np.zeros(len(y)), y)
+    oof = np.empty(len(y))
+    fold_ids = np.empty(len(y), dtype=np.int64)
+    fit_seconds = [0.0] * folds
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        jobs = [pool.submit(_fit_fold, k, train, valid, params, seed, n_jobs) for k, (train, valid) in enumerate(splits)]
+        for job in jobs:
+            fold, valid_idx, proba, seconds = job.result()
+            oof[valid_idx] = proba
+            fold_ids[valid_idx] = fold
+            fit_seconds[fold] = seconds
+    return oof, fold_ids, fit_seconds
+
+
+def _thin(*arrays, n=CURVE_POINTS):
+    # Evenly spaced points of a curve (always keeping both ends), rounded for a compact report.
+    idx = np.unique(np.linspace(0, len(arrays[0]) - 1, min(n, len(arrays[0]))).round().astype(np.int64))
+    return [np.round(a[idx], 5).tolist() for a in arrays]
+
+
+def threshold_table(y, proba, thresholds=THRESHOLDS):
+    """Confusion-matrix metrics of the positive class at each decision threshold."""
+    rows = []
+    for t in thresholds:
+        pred = proba >= t
+        tp = int((pred & (y == 1)).sum())
+        fp = int((pred & (y == 0)).sum())
+        fn = int((~pred & (y == 1)).sum())
+        tn = int((~pred & (y == 0)).sum())
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        rows.append({
+            "threshold": float(t), "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+            "precision": precision, "recall": recall,
+            "specificity": tn / (tn + fp) if tn + fp else 0.0,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "accuracy": (tp + tn) / len(y),
+            "positive_rate": float(pred.mean()),
+        })
+    return rows
+
+
+def evaluate(y, proba, fold_ids=None):
+    """ROC/PR/calibration curves, summary metrics and the threshold table as a JSON-ready dict."""
+    from sklearn.calibration import calibration_curve
+    from sklearn.metrics import (average_precision_score, brier_score_loss, log_loss, precision_recall_curve,
+                                 roc_auc_score, roc_curve)
+
+    fpr, tpr, roc_thresholds = roc_curve(y, proba)
+    precision, recall, pr_thresholds = precision_recall_curve(y, proba)
+    frac_pos, mean_pred = calibration_curve(y, proba, n_bins=10)
+    metrics = {
+        "roc_auc": float(roc_auc_score(y, proba)),
+        "average_precision": float(average_precision_score(y, proba)),
+        "brier": float(brier_score_loss(y, proba)),
+        "log_loss": float(log_loss(y, proba)),
+        "prevalence": float(np.mean(y)),
+    }
+    if fold_ids is not None:
+        fold_auc = [float(roc_auc_score(y[fold_ids == k], proba[fold_ids == k])) for k in np.unique(fold_ids)]
+        metrics["fold_roc_auc"] = fold_auc
+        metrics["roc_auc_std"] = float(np.std(fold_auc))
+    roc = dict(zip(["fpr", "tpr", "threshold"], _thin(fpr, tpr, np.minimum(roc_thresholds, 1.0))))
+    pr = dict(zip(["precision", "recall", "threshold"], _thin(precision[:-1], recall[:-1], pr_thresholds)))
+    return {
+        "metrics": metrics,
+        "roc": roc,
+        "pr": pr,
+        "calibration": {"mean_predicted": mean_pred.tolist(), "fraction_positive": frac_pos.tolist()},
+        "thresholds": threshold_table(y, proba),
+    }
+
+
+def train(path=MODEL_PATH, folds=5, workers=None, params=None, seed=0, save=True, log=None):
+    """Cross-validate, refit on all rows and write the pipeline and its evaluation report."""
+    from core.data import DATA_PATH, dataset_version, load_dataset
+
+    log = log or (lambda msg: None)
+    df = load_dataset(DATA_PATH)
+    X, y = select_features(df), df[TARGET].to_numpy()
+    log(f"{len(y):,} rows; fitting {folds} folds")
+    start = time.perf_counter()
+    oof, fold_ids, fit_seconds = cross_validate(X, y, folds, workers, params, seed)
+    cv_seconds = time.perf_counter() - start
+    report = evaluate(y, oof, fold_ids)
+    log(f"cross-validation took {cv_seconds:.1f}s; ROC AUC {report['metrics']['roc_auc']:.4f}")
+
+    path = Path(path)
+    if save:
+        import joblib
+
+        start = time.perf_counter()
+        pipeline = make_pipeline(params, seed).fit(X, y)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".pkl.{os.getpid()}.tmp")
+        joblib.dump(pipeline, tmp)
+        os.replace(tmp, path)
+        log(f"refit on all rows took {time.perf_counter() - start:.1f}s; saved {path}")
+    report.update({
+        "model_version": artifact_version(path) if save else None,
+        "dataset_version": dataset_version(DATA_PATH),
+        "n_rows": len(y),
+        "folds": folds,
+        "params": {**DEFAULT_PARAMS, **(params or {}), "tree_method": "hist"},
+        "cv_seconds": cv_seconds,
+        "fold_fit_seconds": fit_seconds,
+    })
+    out = evaluation_path(path, saved=save)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(f".json.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(report, indent=2))
+    os.replace(tmp, out)
+    return out
+
+
+def load_evaluation(path=MODEL_PATH):
+    """Read the persisted evaluation report, or return None if it has not been built yet."""
+    try:
+        return json.loads(evaluation_path(path).read_text())
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validate, calibrate-check and retrain the XGBoost pipeline.")
+    parser.add_argument("--model", default=str(MODEL_PATH), help=f"artifact to write (default: {MODEL_PATH})")
+    parser.add_argument("--folds", type=int, default=5, help="stratified CV folds")
+    parser.add_argument("--workers", type=int, help="parallel fold processes (default: one per CPU, at most --folds)")
+    parser.add_argument("--n-estimators", type=int, default=DEFAULT_PARAMS["n_estimators"])
+    parser.add_argument("--max-depth", type=int, default=DEFAULT_PARAMS["max_depth"])
+    parser.add_argument("--learning-rate", type=float, default=DEFAULT_PARAMS["learning_rate"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-save", action="store_true", help="evaluate only; keep the current artifact and its report")
+    args = parser.parse_args(argv)
+    params = {"n_estimators": args.n_estimators, "max_depth": args.max_depth, "learning_rate": args.learning_rate}
+    out = train(args.model, args.folds, args.workers, params, args.seed, save=not args.no_save,
+                log=lambda msg: print(msg, file=sys.stderr))
+    print(f"Report: {out}")
+
+
+if __name__ == "__main__":
+    main()
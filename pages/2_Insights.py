@@ -1,149 +1,288 @@
+import os
+
 import streamlit as st
-import pandas as pd
-import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from core.cohort import CORRELATION_COLUMNS, DIMENSIONS, build_cube, build_index, cohort_stats, selection_key
+from core.data import BMI_CATEGORIES, DATA_PATH, dataset_version
+from core.stats import TARGET, load_stats
+from core.telemetry import Stopwatch, cache_miss, debug_panel, span, traced
 
 st.set_page_config(page_title="Insights", page_icon="", layout="wide")
 st.title(" Key Insights & Questions")
 
+STATUS_COLORS = {'No': 'green', 'Yes': 'red'}
+# Above this many rows the Age vs HbA1c scatter is downsampled or shown as a density grid.
+SCATTER_POINT_BUDGET = int(os.environ.get("SCATTER_POINT_BUDGET", 5000))
+
+# Streaming statistics (core.stats) per dataset version, shared by all sessions: the
+# unfiltered charts are drawn from them without holding the row-level dataset in memory.
+# cache_resource hands out the same object on every rerun, so treat it as read-only.
+@traced("insights.load_stats", cached=True)
+@st.cache_resource
+def load_data(version):
+    cache_miss()
+    return load_stats(DATA_PATH)
+
+# Coded cohort-filter columns, built once per dataset version.
+@traced("insights.cohort_index", cached=True)
+@st.cache_resource
+def load_index(version):
+    cache_miss()
+    return build_index(DATA_PATH)
+
+# Per-cell aggregates of the chart columns, built in one pass on the first filtered view
+# of a dataset version; every filter combination is then summed from them.
+@traced("insights.cohort_cube", cached=True)
+@st.cache_resource
+def load_cube(version):
+    cache_miss()
+    return build_cube(load_index(version), load_data(version), DATA_PATH)
+
+# Statistics of one filter combination, summed from the cells it covers.
+@traced("insights.cohort_stats", cached=True)
+@st.cache_resource(max_entries=16)
+def cohort_tables(version, cohort):
+    cache_miss()
+    return cohort_stats(load_cube(version), dict(cohort))
+
+# Aggregated tables are cached per (dataset version, cohort); `_source` is not hashed.
+# It is the streaming statistics of the whole population or of the selected cohort.
+# Each lookup is timed as a span that records whether the cache answered.
+@traced("insights.table.status_table", cached=True)
+@st.cache_data
+def status_table(key, _source):
+    cache_miss()
+    return _source.status_counts()
+
+@traced("insights.table.category_table", cached=True)
+@st.cache_data
+def category_table(key, col, _source):
+    cache_miss()
+    return _source.category_counts(col)
+
+@traced("insights.table.value_table", cached=True)
+@st.cache_data
+def value_table(key, col, _source):
+    cache_miss()
+    return _source.value_counts(col)
+
+@traced("insights.table.histogram_table", cached=True)
+@st.cache_data
+def histogram_table(key, col, nbins, by, _source):
+    cache_miss()
+    return _source.histogram(col, nbins, by)
+
+@traced("insights.table.box_table", cached=True)
+@st.cache_data
+def box_table(key, col, _source):
+    cache_miss()
+    return _source.box_stats(col)
+
+@traced("insights.table.scatter_sample", cached=True)
+@st.cache_data
+def scatter_sample(key, x, y, n, _source):
+    cache_miss()
+    return _source.stratified_sample([x, y, 'diagnosed_diabetes_str'], n)
+
+@traced("insights.table.density_table", cached=True)
+@st.cache_data
+def density_table(key, x, y, nbins, _source):
+    cache_miss()
+    return _source.histogram2d(x, y, nbins)
+
+@traced("insights.table.correlation_table", cached=True)
 @st.cache_data
-def load_data():
-    return pd.read_csv("data/diabetes_dataset.csv")
+def correlation_table(key, cols, _source):
+    cache_miss()
+    return _source.correlation(list(cols))
+
+def status_bar(table, x, title, labels, order=None):
+    # Grouped bar chart of precomputed counts per diabetes status.
+    fig = px.bar(
+        table, x=x, y='count', color='status', barmode='group', title=title,
+        labels={'status': 'Status', **labels}, color_discrete_map=STATUS_COLORS
+    )
+    if order is not None:
+        fig.update_xaxes(categoryorder='array', categoryarray=order)
+    return fig
+
+def status_histogram(table, title, x_label, y_label='Patients', barmode='overlay', opacity=0.7):
+    # Histogram drawn from precomputed bins; bars span the full bin width like px.histogram.
+    fig = px.bar(
+        table, x='bin_mid', y='count', color='status', barmode=barmode, opacity=opacity, title=title,
+        labels={'bin_mid': x_label, 'count': y_label, 'status': 'Status'},
+        color_discrete_map=STATUS_COLORS
+    )
+    if barmode == 'overlay':
+        fig.update_traces(width=float(table['bin_right'].iloc[0] - table['bin_left'].iloc[0]))
+        fig.update_layout(bargap=0)
+    return fig
+
+def status_density(table, title, x_label, y_label):
+    # Side-by-side 2D count grids, one per diabetes status, on shared bins.
+    statuses = list(table['status'].unique())
+    fig = make_subplots(rows=1, cols=len(statuses), shared_yaxes=True, subplot_titles=statuses)
+    for i, status in enumerate(statuses, start=1):
+        grid = table[table['status'] == status].pivot(index='y_mid', columns='x_mid', values='count')
+        fig.add_trace(go.Heatmap(
+            x=grid.columns, y=grid.index, z=grid.to_numpy(), name=status, coloraxis='coloraxis'
+        ), row=1, col=i)
+        fig.update_xaxes(title_text=x_label, row=1, col=i)
+    fig.update_yaxes(title_text=y_label, row=1, col=1)
+    fig.update_layout(title=title, coloraxis={'colorscale': 'Viridis', 'colorbar': {'title': 'Patients'}})
+    return fig
+
+def status_box(stats, title, y_label):
+    # Box plot from precomputed quartiles and Tukey fences (outlier points are not drawn).
+    fig = go.Figure([
+        go.Box(
+            name=row.status, x=[row.status], q1=[row.q1], median=[row.median], q3=[row.q3],
+            lowerfence=[row.lowerfence], upperfence=[row.upperfence], mean=[row.mean],
+            marker_color=STATUS_COLORS[row.status]
+        )
+        for row in stats.itertuples()
+    ])
+    fig.update_layout(title=title, xaxis_title='Status', yaxis_title=y_label, legend_title_text='Status')
+    return fig
+
+def show_chart(fig):
+    # Building time is measured from the previous chart (or the start of the section);
+    # the render span covers Plotly serialization and sending the figure.
+    title = fig.layout.title.text or 'untitled'
+    chart_clock.lap(f"insights.chart.build:{title}")
+    with span(f"insights.chart.render:{title}"):
+        st.plotly_chart(fig, use_container_width=True)
+    chart_clock.reset()
 
 try:
-    df = load_data()
+    version = dataset_version(DATA_PATH)
+    stats = load_data(version)
+    index = load_index(version)
 except Exception:
     st.error("Could not load data file at data/diabetes_dataset.csv")
     st.stop()
 
-df2 = df.copy()
-df2['diagnosed_diabetes_str'] = df2['diagnosed_diabetes'].map({0: 'No', 1: 'Yes'})
+st.sidebar.header("Cohort")
+selection = {
+    dim: st.sidebar.multiselect(label, index.labels[dim], key=f"cohort_{dim}")
+    for dim, label in DIMENSIONS.items()
+}
+cohort = selection_key(selection)
+key = (version, cohort)
+if cohort:
+    n_cohort = index.count(selection)
+    st.sidebar.caption(f"{n_cohort:,} of {index.n_rows:,} patients match.")
+    if n_cohort == 0:
+        st.warning("No patients match the selected cohort filters.")
+        st.stop()
+    source = cohort_tables(version, cohort)
+    st.sidebar.caption("Cohort charts use the population's bin edges; measurements with many distinct values "
+                       "are counted on a grid of 120 steps over their range.")
+else:
+    source = stats
 
-tab_demo, tab_history, tab_clinical = st.tabs([
-    " Demographics & Lifestyle",
-    " Medical History ",
-    " Clinical Measurements"
-])
+# Only the selected section runs: unlike st.tabs, which executes every tab on each rerun,
+# the other sections build and send no figures until they are picked.
+section = st.radio(
+    "Section",
+    [" Demographics & Lifestyle", " Medical History ", " Clinical Measurements"],
+    horizontal=True, label_visibility="collapsed", key="insights_section"
+)
 
 # ============== DEMOGRAPHICS & LIFESTYLE ==============
-with tab_demo:
+def render_demographics():
     st.subheader("Prevalence and Demographic Patterns")
+    prevalence = status_table(key, source)
     c1, c2 = st.columns(2)
     with c1:
-        fig = px.histogram(
-            df2, x='diagnosed_diabetes_str', color='diagnosed_diabetes_str',
+        fig = px.bar(
+            prevalence, x='status', y='count', color='status',
             title='Prevalence of Diagnosed Diabetes',
-            labels={'diagnosed_diabetes_str': 'Status', 'count': 'Count'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+            labels={'status': 'Status', 'count': 'Count'},
+            color_discrete_map=STATUS_COLORS
         )
         fig.update_layout(bargap=0.2, showlegend=False)
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
     with c2:
-        pie_df = df.copy()
-        pie_df['diagnosed_diabetes'] = pie_df['diagnosed_diabetes'].map({
-            0: "doesn't have diabetes", 1: "have diabetes"
-        })
+        pie_df = prevalence.assign(
+            diagnosed_diabetes=prevalence['status'].map({'No': "doesn't have diabetes", 'Yes': "have diabetes"})
+        )
         fig = px.pie(
-            pie_df, names='diagnosed_diabetes',
+            pie_df, names='diagnosed_diabetes', values='count',
             title='Overall Percentage of Diagnosed Diabetes',
             color='diagnosed_diabetes',
             color_discrete_map={"doesn't have diabetes": 'green', "have diabetes": 'red'},
             hole=0.45
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
 
     st.subheader("Gender & Smoking")
     c1, c2 = st.columns(2)
     with c1:
-        fig = px.histogram(
-            df2, x='gender', color='diagnosed_diabetes_str',
-            barmode='group',
-            title='Diagnosed Diabetes per Gender',
-            labels={'diagnosed_diabetes_str': 'Status', 'count': 'Count'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_bar(
+            category_table(key, 'gender', source), 'gender',
+            'Diagnosed Diabetes per Gender', {'count': 'Count'}, ['Male', 'Female', 'Other']
         )
-        fig.update_xaxes(categoryorder='array', categoryarray=['Male', 'Female', 'Other'])
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
     with c2:
-        fig = px.pie(df, names='smoking_status', title='Smoking Status Distribution', hole=0.5)
-        st.plotly_chart(fig, use_container_width=True)
+        fig = px.pie(
+            value_table(key, 'smoking_status', source), names='smoking_status', values='count',
+            title='Smoking Status Distribution', hole=0.5
+        )
+        show_chart(fig)
 
-    fig = px.histogram(
-        df2, x='smoking_status', color='diagnosed_diabetes_str',
-        barmode='group',
-        title='Diagnosed Diabetes per Smoking Status',
-        labels={'diagnosed_diabetes_str': 'Status', 'count': 'Count'},
-        color_discrete_map={'No': 'green', 'Yes': 'red'}
+    fig = status_bar(
+        category_table(key, 'smoking_status', source), 'smoking_status',
+        'Diagnosed Diabetes per Smoking Status', {'count': 'Count'}, ['Never', 'Former', 'Current']
     )
-    fig.update_xaxes(categoryorder='array', categoryarray=['Never', 'Former', 'Current'])
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig)
 
     st.subheader("BMI and Lifestyle Indicators")
     # BMI distribution with thresholds
-    fig = px.histogram(
-        df, x='bmi', nbins=40,
+    bmi_bins = histogram_table(key, 'bmi', 40, None, source)
+    fig = px.bar(
+        bmi_bins, x='bin_mid', y='count',
         title='Distribution of BMI with Clinical Thresholds',
-        labels={'bmi': 'BMI (kg/m²)', 'count': 'Frequency'}
+        labels={'bin_mid': 'BMI (kg/m²)', 'count': 'Frequency'}
     )
+    fig.update_traces(width=float(bmi_bins['bin_right'].iloc[0] - bmi_bins['bin_left'].iloc[0]))
     fig.add_vline(x=25.0, line_dash='dash', line_color='gold', annotation_text='Overweight (25.0)')
     fig.add_vline(x=30.0, line_dash='dash', line_color='red', annotation_text='Obesity (30.0)')
     fig.update_layout(bargap=0.05, showlegend=False)
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig)
 
     # BMI categories prevalence
-    def bmi_category(bmi):
-        if bmi < 18.5: return 'Underweight - bmi < 18.5'
-        elif bmi < 25: return 'Normal - bmi < 25'
-        elif bmi < 30: return 'Overweight - bmi < 30'
-        else: return 'Obese - bmi > 30'
-    df2['BMI Category'] = df2['bmi'].apply(bmi_category)
-    fig = px.histogram(
-        df2, x='BMI Category', color='diagnosed_diabetes_str',
-        barmode='group',
-        title='Diabetes Prevalence by BMI Category',
-        labels={'diagnosed_diabetes_str': 'Status', 'count': 'Individuals'},
-        color_discrete_map={'No': 'green', 'Yes': 'red'}
+    fig = status_bar(
+        category_table(key, 'BMI Category', source), 'BMI Category',
+        'Diabetes Prevalence by BMI Category', {'count': 'Individuals'}, BMI_CATEGORIES
     )
-    fig.update_xaxes(categoryorder='array', categoryarray=[
-        'Underweight - bmi < 18.5', 'Normal - bmi < 25', 'Overweight - bmi < 30', 'Obese - bmi > 30'
-    ])
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig)
 
     # Alcohol and Physical Activity vs Diabetes
     c1, c2 = st.columns(2)
     with c1:
-        fig = px.histogram(
-            df2, x='alcohol_consumption_per_week', color='diagnosed_diabetes_str',
-            barmode='group', nbins=20,
-            title='Alcohol Consumption vs Diabetes',
-            labels={'alcohol_consumption_per_week': 'Drinks/week', 'count': 'Patients'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_histogram(
+            histogram_table(key, 'alcohol_consumption_per_week', 20, TARGET, source),
+            'Alcohol Consumption vs Diabetes', 'Drinks/week', barmode='group', opacity=None
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
     with c2:
-        fig = px.histogram(
-            df2, x='physical_activity_minutes_per_week', color='diagnosed_diabetes_str',
-            nbins=40, barmode='overlay', opacity=0.7,
-            title='Physical Activity vs Diabetes',
-            labels={'physical_activity_minutes_per_week': 'Min/week', 'count': 'Patients'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_histogram(
+            histogram_table(key, 'physical_activity_minutes_per_week', 40, TARGET, source),
+            'Physical Activity vs Diabetes', 'Min/week'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
 # People counts lines: Drinks/week (left) and Physical Activity (right)
     st.subheader("Population Distributions (Counts)")
     c1, c2 = st.columns(2)
 
     with c1:
         # Alcohol: people count vs drinks/week
-        alcohol_counts = (
-            df2['alcohol_consumption_per_week']
-            .value_counts(dropna=False)
-            .sort_index()
-            .reset_index()
-        )
+        alcohol_counts = value_table(key, 'alcohol_consumption_per_week', source)
         alcohol_counts.columns = ['drinks_per_week', 'n_people']
-        alcohol_counts['drinks_per_week'] = pd.to_numeric(alcohol_counts['drinks_per_week'], errors='coerce')
-        alcohol_counts = alcohol_counts.dropna(subset=['drinks_per_week'])
 
         fig = px.line(
             alcohol_counts,
@@ -154,28 +293,15 @@ with tab_demo:
         )
         fig.update_traces(mode='lines+markers')
         fig.update_layout(xaxis=dict(dtick=1))
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
 
     with c2:
         # Physical Activity: people count vs minutes/week
-        activity_counts = (
-            df2['physical_activity_minutes_per_week']
-            .value_counts(dropna=False)
-            .sort_index()
-            .reset_index()
-        )
+        activity_counts = value_table(key, 'physical_activity_minutes_per_week', source)
         activity_counts.columns = ['minutes_per_week', 'n_people']
-        activity_counts['minutes_per_week'] = pd.to_numeric(activity_counts['minutes_per_week'], errors='coerce')
-        activity_counts = activity_counts.dropna(subset=['minutes_per_week'])
-
-        # If the minute range is large and too spiky, you can bin for readability:
-        # bins = list(range(0, 1001, 50)) + [df2['physical_activity_minutes_per_week'].max()]
-        # activity_counts = (
-        #     df2.assign(_bin=pd.cut(df2['physical_activity_minutes_per_week'], bins=bins, right=False))
-        #       .groupby('_bin', as_index=False)
-        #       .size()
-        #       .rename(columns={'_bin': 'minutes_bin', 'size': 'n_people'})
-        # )
+
+        # If the minute range is large and too spiky, use the binned table for readability:
+        # activity_counts = histogram_table(key, 'physical_activity_minutes_per_week', 20, None, source)
 
         fig = px.line(
             activity_counts,
@@ -187,28 +313,22 @@ with tab_demo:
         fig.update_traces(mode='lines+markers')
         # Optional: set tick spacing if range is big (e.g., every 50 or 100 minutes)
         # fig.update_layout(xaxis=dict(dtick=50))
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
 
     # New: Sleep & Screen Time distributions by diabetes
     c1, c2 = st.columns(2)
     with c1:
-        fig = px.histogram(
-            df2, x='sleep_hours_per_day', color='diagnosed_diabetes_str',
-            barmode='overlay', nbins=24, opacity=0.7,
-            title='Sleep Hours per Day by Diabetes Status',
-            labels={'sleep_hours_per_day': 'Hours/day', 'count': 'Patients'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_histogram(
+            histogram_table(key, 'sleep_hours_per_day', 24, TARGET, source),
+            'Sleep Hours per Day by Diabetes Status', 'Hours/day'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
     with c2:
-        fig = px.histogram(
-            df2, x='screen_time_hours_per_day', color='diagnosed_diabetes_str',
-            barmode='overlay', nbins=24, opacity=0.7,
-            title='Screen Time per Day by Diabetes Status',
-            labels={'screen_time_hours_per_day': 'Hours/day', 'count': 'Patients'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_histogram(
+            histogram_table(key, 'screen_time_hours_per_day', 24, TARGET, source),
+            'Screen Time per Day by Diabetes Status', 'Hours/day'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
 
     # Demographic: Ethnicity, Education, Income, Employment
     st.subheader("Demographic Patterns")
@@ -219,61 +339,62 @@ with tab_demo:
         ('employment_status', 'Diabetes Prevalence by Employment Status', ['Employed', 'Unemployed', 'Retired', 'Student'])
     ]
     for col, title, order in config:
-        fig = px.histogram(
-            df2, x=col, color='diagnosed_diabetes_str',
-            barmode='group',
-            title=title,
-            labels={'diagnosed_diabetes_str': 'Status', 'count': 'Individuals'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
-        )
-        fig.update_xaxes(categoryorder='array', categoryarray=order)
-        st.plotly_chart(fig, use_container_width=True)
+        fig = status_bar(category_table(key, col, source), col, title, {'count': 'Individuals'}, order)
+        show_chart(fig)
 
 # ============== MEDICAL HISTORY  ==============
-with tab_history:
+def render_history():
     st.subheader("Family & Comorbidities")
     # Family history, Hypertension, Cardiovascular — prevalence by diabetes
     for col in ['family_history_diabetes', 'hypertension_history', 'cardiovascular_history']:
-        fig = px.histogram(
-            df2, x=col, color='diagnosed_diabetes_str',
-            barmode='group', category_orders={col: [0, 1]},
-            title=f'{col.replace("_", " ").title()} vs Diabetes Diagnosis',
-            labels={col: f'{col} (0=No, 1=Yes)', 'diagnosed_diabetes_str': 'Status', 'count': 'Patients'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_bar(
+            category_table(key, col, source), col,
+            f'{col.replace("_", " ").title()} vs Diabetes Diagnosis',
+            {col: f'{col} (0=No, 1=Yes)', 'count': 'Patients'}
         )
-        st.plotly_chart(fig, use_container_width=True)
+        fig.update_xaxes(type='category', categoryorder='array', categoryarray=[0, 1])
+        show_chart(fig)
 
 
 # ============== CLINICAL MEASUREMENTS ==============
-with tab_clinical:
+def render_clinical():
     st.subheader("Glucose & HbA1c")
     c1, c2 = st.columns(2)
     with c1:
-        fig = px.box(
-            df2, x='diagnosed_diabetes_str', y='hba1c', color='diagnosed_diabetes_str',
-            title='HbA1c by Diabetes Status',
-            labels={'diagnosed_diabetes_str': 'Status', 'hba1c': 'HbA1c (%)'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        fig = status_box(box_table(key, 'hba1c', source), 'HbA1c by Diabetes Status', 'HbA1c (%)')
+        show_chart(fig)
     with c2:
-        fig = px.box(
-            df2, x='diagnosed_diabetes_str', y='glucose_fasting', color='diagnosed_diabetes_str',
-            title='Fasting Glucose by Diabetes Status',
-            labels={'diagnosed_diabetes_str': 'Status', 'glucose_fasting': 'Fasting Glucose (mg/dL)'},
-            color_discrete_map={'No': 'green', 'Yes': 'red'}
+        fig = status_box(
+            box_table(key, 'glucose_fasting', source), 'Fasting Glucose by Diabetes Status', 'Fasting Glucose (mg/dL)'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig)
 
-    # Age vs HbA1c scatter
-    fig = px.scatter(
-        df2, x='age', y='hba1c', color='diagnosed_diabetes_str',
-        title='Age vs HbA1c (by Diabetes Status)',
-        labels={'age': 'Age', 'hba1c': 'HbA1c (%)', 'diagnosed_diabetes_str': 'Diabetes'},
-        color_discrete_map={'No': 'green', 'Yes': 'red'},
-        opacity=0.5
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    # Age vs HbA1c scatter: WebGL points, stratified-sampled or density-binned above the point budget
+    scatter_view = 'Points'
+    if source.n_rows > SCATTER_POINT_BUDGET:
+        scatter_view = st.radio(
+            "Age vs HbA1c view", ['Points', 'Density'], horizontal=True,
+            help=f"Points shows a sample of {SCATTER_POINT_BUDGET:,} patients stratified by diabetes status; "
+                 "Density bins all patients."
+        )
+    if scatter_view == 'Points':
+        points = scatter_sample(key, 'age', 'hba1c', SCATTER_POINT_BUDGET, source)
+        fig = px.scatter(
+            points, x='age', y='hba1c', color='diagnosed_diabetes_str',
+            title='Age vs HbA1c (by Diabetes Status)',
+            labels={'age': 'Age', 'hba1c': 'HbA1c (%)', 'diagnosed_diabetes_str': 'Diabetes'},
+            color_discrete_map={'No': 'green', 'Yes': 'red'},
+            opacity=0.5, render_mode='webgl'
+        )
+        show_chart(fig)
+        if len(points) < source.n_rows:
+            st.caption(f"Showing {len(points):,} of {source.n_rows:,} patients, sampled within each diabetes status.")
+    else:
+        fig = status_density(
+            density_table(key, 'age', 'hba1c', 40, source),
+            'Age vs HbA1c Density (by Diabetes Status)', 'Age', 'HbA1c (%)'
+        )
+        show_chart(fig)
 
     st.subheader("Other Clinical Indicators")
     # Vitals/lipids distributions by diabetes
@@ -291,21 +412,30 @@ with tab_clinical:
         c1, c2 = st.columns(2)
         for col, label in grid[i:i+2]:
             with (c1 if col == grid[i][0] else c2):
-                fig = px.histogram(
-                    df2, x=col, color='diagnosed_diabetes_str',
-                    barmode='overlay', opacity=0.6, nbins=40,
-                    title=f'{label} Distribution by Diabetes Status',
-                    labels={col: label, 'diagnosed_diabetes_str': 'Status'},
-                    color_discrete_map={'No': 'green', 'Yes': 'red'}
+                fig = status_histogram(
+                    histogram_table(key, col, 40, TARGET, source),
+                    f'{label} Distribution by Diabetes Status', label, y_label='count', opacity=0.6
                 )
-                st.plotly_chart(fig, use_container_width=True)
+                show_chart(fig)
 
     st.subheader("Correlation heatmap of key biomarkers")
-    core_clinical_vars = ['hba1c', 'glucose_fasting', 'insulin_level', 'bmi', 'systolic_bp', 'triglycerides']
-    corr_matrix = df[core_clinical_vars].corr().round(2)
+    core_clinical_vars = CORRELATION_COLUMNS
+    corr_matrix = correlation_table(key, tuple(core_clinical_vars), source).round(2)
     fig = px.imshow(
         corr_matrix, text_auto=True, color_continuous_scale='cividis',
         title='Correlation Heatmap of Key Clinical Biomarkers'
     )
     fig.update_layout(xaxis_title='', yaxis_title='', xaxis_showgrid=False, yaxis_showgrid=False)
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig)
+
+
+chart_clock = Stopwatch()
+with span(f"insights.section:{section.strip()}"):
+    if section == " Demographics & Lifestyle":
+        render_demographics()
+    elif section == " Medical History ":
+        render_history()
+    else:
+        render_clinical()
+
+debug_panel()
@@ -1,57 +1,89 @@
+import io
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
-import plotly.graph_objects as go
+
+from core.batch import DEFAULT_CHUNKSIZE, score_file
+from core.drift import MONITOR
+from core.model import MODEL_PATH, artifact_version, get_model
+from core.population import distribution, load_population, percentile, population_path
+from core.prediction_cache import PREDICTION_CACHE, predict_one_cached
+from core.schema import build_input
+from core.scoring import DEFAULT_THRESHOLD, sensitivity
+from core.telemetry import cache_miss, debug_panel, span
 
 st.set_page_config(page_title="Prediction", page_icon="", layout="wide")
 st.title("🧪 Diabetes Prediction")
 
-@st.cache_resource
+# Inputs offered in the what-if panel: label and the form's slider range.
+WHAT_IF_FEATURES = {
+    "hba1c": ("HbA1c (%)", 4.0, 15.0),
+    "glucose_fasting": ("Fasting Glucose", 60, 300),
+    "bmi": ("BMI", 10.0, 60.0),
+    "physical_activity_minutes_per_week": ("Physical Activity (min/week)", 0, 1500),
+}
+
 def load_model():
-    return joblib.load("models/xgb.pkl")
-
-def build_input(form):
-    return pd.DataFrame([{
-        # Demographic & lifestyle
-        "age": form["age"],
-        "gender": form["gender"],
-        "ethnicity": form["ethnicity"],
-        "education_level": form["education_level"],
-        "income_level": form["income_level"],
-        "employment_status": form["employment_status"],
-        "smoking_status": form["smoking_status"],
-        "alcohol_consumption_per_week": form["alcohol_consumption_per_week"],
-        "physical_activity_minutes_per_week": form["physical_activity_minutes_per_week"],
-        "diet_score": form["diet_score"],
-        "sleep_hours_per_day": form["sleep_hours_per_day"],
-        "screen_time_hours_per_day": form["screen_time_hours_per_day"],
-        # History
-        "family_history_diabetes": int(form["family_history_diabetes"]),
-        "hypertension_history": int(form["hypertension_history"]),
-        "cardiovascular_history": int(form["cardiovascular_history"]),
-        # Clinical
-        "bmi": form["bmi"],
-        "waist_to_hip_ratio": form["waist_to_hip_ratio"],
-        "systolic_bp": form["systolic_bp"],
-        "diastolic_bp": form["diastolic_bp"],
-        "heart_rate": form["heart_rate"],
-        "cholesterol_total": form["cholesterol_total"],
-        "hdl_cholesterol": form["hdl_cholesterol"],
-        "ldl_cholesterol": form["ldl_cholesterol"],
-        "triglycerides": form["triglycerides"],
-        "glucose_fasting": form["glucose_fasting"],
-        "glucose_postprandial": form["glucose_postprandial"],
-        "insulin_level": form["insulin_level"],
-        "hba1c": form["hba1c"],
-    }])
+    # Loaded, validated and warmed up once per process (and per artifact version) by core.model.
+    return get_model()
+
+@st.cache_data
+def load_scores(mtime):
+    # Sorted dataset scores from `python -m core.population`; keyed on the file's mtime so a rebuild is picked up.
+    cache_miss()
+    return load_population(MODEL_PATH)
 
 try:
-    model = load_model()
+    with span("prediction.load_model", cached=True):
+        model = load_model()
 except Exception as e:
     st.error(f"Failed to load model at models/xgb.pkl: {e}")
     st.stop()
 
+threshold = st.sidebar.slider("Decision threshold", 0.05, 0.95, DEFAULT_THRESHOLD, 0.05,
+                              help="Minimum predicted probability for a Diabetes (1) prediction.")
+
+# Filled in at the end of the run, once this run's predictions have hit or missed the cache
+cache_caption = st.sidebar.empty()
+
+def show_cache_stats():
+    cache_stats = PREDICTION_CACHE.stats()
+    cache_caption.caption(
+        f"Prediction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['size']} cached)"
+    )
+
+mode = st.radio("Mode", ["Single patient", "Batch file"], horizontal=True, label_visibility="collapsed")
+
+if mode == "Batch file":
+    st.subheader("Score a File of Patients")
+    st.caption("Upload a CSV or Parquet file with the same columns as the single-patient form. "
+               "Rows are scored in chunks; use `python -m core.batch` for very large extracts.")
+    upload = st.file_uploader("Patient file", type=["csv", "parquet"])
+    if upload is not None and st.button("🔍 Score File", use_container_width=True):
+        in_fmt = "parquet" if upload.name.lower().endswith(".parquet") else "csv"
+        out = io.BytesIO()
+        status = st.empty()
+        try:
+            with span("prediction.score_file"):
+                n_rows = score_file(
+                    model, upload, out, DEFAULT_CHUNKSIZE, in_fmt=in_fmt, out_fmt="csv", threshold=threshold,
+                    on_chunk=lambda n: status.info(f"Scored {n:,} rows..."),
+                    on_scored=lambda scored: MONITOR.add(scored, scored["probability"]),
+                )
+        except Exception as e:
+            st.error(f"Batch scoring failed: {e}")
+            st.stop()
+        status.success(f"Scored {n_rows:,} rows")
+        out.seek(0)
+        st.dataframe(pd.read_csv(out, nrows=20), use_container_width=True)
+        st.download_button("Download scored file", out.getvalue(),
+                           file_name=f"{upload.name.rsplit('.', 1)[0]}_scored.csv", mime="text/csv")
+    show_cache_stats()
+    debug_panel()
+    st.stop()
+
 with st.form("predict"):
     st.subheader("Enter Patient Information")
     c1, c2, c3 = st.columns(3)
@@ -90,28 +122,47 @@ with st.form("predict"):
     submitted = st.form_submit_button("🔍 Predict", use_container_width=True)
 
 if submitted:
-    X_input = build_input({
-        "age": age, "gender": gender, "ethnicity": ethnicity, "education_level": education_level,
-        "income_level": income_level, "employment_status": employment_status, "smoking_status": smoking_status,
-        "alcohol_consumption_per_week": alcohol_consumption_per_week,
-        "physical_activity_minutes_per_week": physical_activity_minutes_per_week,
-        "diet_score": diet_score, "sleep_hours_per_day": sleep_hours_per_day,
-        "screen_time_hours_per_day": screen_time_hours_per_day,
-        "family_history_diabetes": family_history_diabetes, "hypertension_history": hypertension_history,
-        "cardiovascular_history": cardiovascular_history, "bmi": bmi, "waist_to_hip_ratio": waist_to_hip_ratio,
-        "systolic_bp": systolic_bp, "diastolic_bp": diastolic_bp, "heart_rate": heart_rate,
-        "cholesterol_total": cholesterol_total, "hdl_cholesterol": hdl_cholesterol,
-        "ldl_cholesterol": ldl_cholesterol, "triglycerides": triglycerides,
-        "glucose_fasting": glucose_fasting, "glucose_postprandial": glucose_postprandial,
-        "insulin_level": insulin_level, "hba1c": hba1c
-    })
-
-    try:
-        pred = int(model.predict(X_input)[0])
-        prob = model.predict_proba(X_input)[0][1] if hasattr(model, "predict_proba") else None
-    except Exception as e:
-        st.error(f"Prediction failed: {e}")
-        st.stop()
+    with span("prediction.build_input"):
+        st.session_state["patient"] = build_input({
+            "age": age, "gender": gender, "ethnicity": ethnicity, "education_level": education_level,
+            "income_level": income_level, "employment_status": employment_status, "smoking_status": smoking_status,
+            "alcohol_consumption_per_week": alcohol_consumption_per_week,
+            "physical_activity_minutes_per_week": physical_activity_minutes_per_week,
+            "diet_score": diet_score, "sleep_hours_per_day": sleep_hours_per_day,
+            "screen_time_hours_per_day": screen_time_hours_per_day,
+            "family_history_diabetes": family_history_diabetes, "hypertension_history": hypertension_history,
+            "cardiovascular_history": cardiovascular_history, "bmi": bmi, "waist_to_hip_ratio": waist_to_hip_ratio,
+            "systolic_bp": systolic_bp, "diastolic_bp": diastolic_bp, "heart_rate": heart_rate,
+            "cholesterol_total": cholesterol_total, "hdl_cholesterol": hdl_cholesterol,
+            "ldl_cholesterol": ldl_cholesterol, "triglycerides": triglycerides,
+            "glucose_fasting": glucose_fasting, "glucose_postprandial": glucose_postprandial,
+            "insulin_level": insulin_level, "hba1c": hba1c
+        })
+
+# Keep showing the last result while the what-if controls trigger reruns
+if "patient" in st.session_state:
+    X_input = st.session_state["patient"]
+
+    # Only a submission (or a new model artifact) looks the patient up in the prediction cache;
+    # threshold and what-if reruns reuse the stored result so they don't inflate the hit rate
+    version = artifact_version()
+    if submitted or st.session_state.get("prediction", (None,))[0] != version:
+        try:
+            with span("prediction.predict", cached=True):
+                result = predict_one_cached(model, X_input, version, threshold, explain=True)
+        except Exception as e:
+            st.error(f"Prediction failed: {e}")
+            st.stop()
+        st.session_state["prediction"] = (version, *result)
+    _, pred, prob, contributions = st.session_state["prediction"]
+    if prob is not None:
+        pred = int(prob >= threshold)
+    if submitted:
+        # Only new submissions enter the drift window, not what-if reruns of the same patient
+        MONITOR.add(X_input, [prob])
+
+    # Plotly is only imported once there is a result to draw
+    import plotly.graph_objects as go
 
     st.markdown("---")
     st.subheader("Result")
@@ -121,7 +172,6 @@ if submitted:
             st.error("Prediction: Diabetes (1)")
         else:
             st.success("Prediction: No Diabetes (0)")
-    with colB:
         if prob is not None:
             gauge = go.Figure(go.Indicator(
                 mode="gauge+number",
@@ -136,6 +186,91 @@ if submitted:
                        ]}
             ))
             st.plotly_chart(gauge, use_container_width=True)
+    with colB:
+        if prob is not None:
+            # What-if: the whole grid of perturbed copies is scored in one predict_proba call
+            what_if = st.multiselect(
+                "What-if: vary up to two inputs", list(WHAT_IF_FEATURES), default=["hba1c"],
+                max_selections=2, format_func=lambda c: WHAT_IF_FEATURES[c][0]
+            )
+            n_points = 60 if len(what_if) == 1 else 30
+            grids = {c: np.linspace(WHAT_IF_FEATURES[c][1], WHAT_IF_FEATURES[c][2], n_points) for c in what_if}
+            if len(what_if) == 1:
+                col = what_if[0]
+                with span("prediction.sensitivity", points=n_points):
+                    sweep = sensitivity(model, X_input, grids)
+                fig = go.Figure(go.Scatter(x=sweep[col], y=sweep['probability'] * 100, mode='lines'))
+                fig.add_hline(y=threshold * 100, line_dash='dot', line_color='gray', annotation_text='Threshold')
+                fig.add_trace(go.Scatter(
+                    x=[X_input[col].iloc[0]], y=[prob * 100], mode='markers',
+                    marker={'color': 'black', 'size': 10}, name='This patient'
+                ))
+                fig.update_layout(
+                    title=f'Risk vs {WHAT_IF_FEATURES[col][0]}', showlegend=False,
+                    xaxis_title=WHAT_IF_FEATURES[col][0], yaxis_title='Risk Probability (%)', yaxis_range=[0, 100]
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            elif len(what_if) == 2:
+                x_col, y_col = what_if
+                with span("prediction.sensitivity", points=n_points ** 2):
+                    sweep = sensitivity(model, X_input, grids)
+                grid = sweep.pivot(index=y_col, columns=x_col, values='probability') * 100
+                fig = go.Figure(go.Heatmap(
+                    x=grid.columns, y=grid.index, z=grid.to_numpy(), zmin=0, zmax=100,
+                    colorscale='RdYlGn_r', colorbar={'title': 'Risk %'}
+                ))
+                fig.add_trace(go.Scatter(
+                    x=[X_input[x_col].iloc[0]], y=[X_input[y_col].iloc[0]], mode='markers',
+                    marker={'color': 'black', 'size': 10, 'symbol': 'x'}, name='This patient'
+                ))
+                fig.update_layout(
+                    title=f'Risk by {WHAT_IF_FEATURES[x_col][0]} and {WHAT_IF_FEATURES[y_col][0]}',
+                    xaxis_title=WHAT_IF_FEATURES[x_col][0], yaxis_title=WHAT_IF_FEATURES[y_col][0]
+                )
+                st.plotly_chart(fig, use_container_width=True)
+
+    population_file = population_path(MODEL_PATH)
+    with span("prediction.load_population", cached=True):
+        population = load_scores(population_file.stat().st_mtime_ns) if population_file.exists() else None
+    if prob is not None and population is not None:
+        # Percentile by binary search in the stored sorted scores; the population is never rescored here
+        st.subheader("Where This Patient Falls")
+        if population["model_version"] != artifact_version():
+            st.warning("Population scores were computed with a different model version; "
+                       "rerun `python -m core.population`.")
+        scores = population["scores"]
+        with span("prediction.percentile"):
+            pct = percentile(scores, prob)
+        st.write(f"This risk is higher than **{pct:.0f}%** of the {population['n_rows']:,} patients in the dataset.")
+        edges, share = distribution(scores)
+        fig = go.Figure(go.Bar(
+            x=(edges[:-1] + edges[1:]) * 50, y=share * 100, width=float(edges[1] - edges[0]) * 100,
+            marker_color='lightgray', name='Population'
+        ))
+        fig.add_vline(x=prob * 100, line_color='black', annotation_text=f'This patient ({pct:.0f}th pct)')
+        fig.add_vline(x=threshold * 100, line_dash='dot', line_color='gray', annotation_text='Threshold',
+                      annotation_position='bottom right')
+        fig.update_layout(
+            title='Risk Distribution of the Dataset Population', bargap=0, showlegend=False,
+            xaxis_title='Risk Probability (%)', yaxis_title='Patients (%)', xaxis_range=[0, 100]
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    elif prob is not None:
+        st.caption("Run `python -m core.population` to see how this risk compares with the dataset population.")
+
+    if contributions is not None:
+        # Per-field TreeSHAP contributions, computed in the same pipeline pass as the probability
+        st.subheader("What Drove This Prediction")
+        top = contributions[contributions.abs().sort_values(ascending=False).index[:10]][::-1]
+        fig = go.Figure(go.Bar(
+            x=top.values, y=[c.replace('_', ' ') for c in top.index], orientation='h',
+            marker_color=['red' if v > 0 else 'green' for v in top.values]
+        ))
+        fig.update_layout(
+            title='Top 10 Inputs by Contribution to Risk',
+            xaxis_title='Contribution (log-odds; positive raises risk)', height=400
+        )
+        st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("---")
     if pred == 1:
@@ -151,4 +286,8 @@ if submitted:
         st.subheader("🎉 Positive News")
         st.write("Your risk appears low based on the current inputs.")
         st.write("Keep up healthy habits: regular exercise, balanced diet, sufficient sleep, and periodic checkups.")
-        st.balloons()
+        if submitted:
+            st.balloons()
+
+show_cache_stats()
+debug_panel()
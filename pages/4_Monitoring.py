@@ -0,0 +1,94 @@
+import streamlit as st
+import pandas as pd
+
+from core.data import DATA_PATH, dataset_version
+from core.drift import MIN_ROWS, MONITOR, load_reference
+from core.telemetry import cache_miss, debug_panel, span
+
+st.set_page_config(page_title="Monitoring", page_icon="", layout="wide")
+st.title("📡 Input Drift Monitoring")
+st.write("Compares the patients scored by this app (Prediction page, single and batch) with the training dataset.")
+
+LEVEL_COLORS = {'stable': 'green', 'moderate': 'orange', 'major': 'red'}
+
+@st.cache_resource
+def load_drift_reference(version):
+    # Compact per-feature histograms (core.drift), derived from the cached dataset statistics
+    # once per dataset version; the training CSV is not rescanned on reruns.
+    cache_miss()
+    return load_reference(DATA_PATH)
+
+try:
+    with span("monitoring.load_reference", cached=True):
+        MONITOR.attach(load_drift_reference(dataset_version(DATA_PATH)))
+except Exception:
+    st.error("Could not load data file at data/diabetes_dataset.csv")
+    st.stop()
+
+if st.sidebar.button("Clear window"):
+    MONITOR.clear()
+
+window = MONITOR.stats()
+c1, c2, c3 = st.columns(3)
+c1.metric("Rows in window", f"{window['size']:,} / {window['capacity']:,}")
+c2.metric("Patients scored", f"{window['total']:,}")
+c3.metric("Mean predicted risk",
+          f"{window['mean_probability'] * 100:.1f}%" if window['mean_probability'] is not None else "—")
+
+if window['size'] == 0:
+    st.info("No patients have been scored in this app process yet. "
+            f"The latest {window['capacity']:,} scored rows are kept in a rolling window.")
+    debug_panel()
+    st.stop()
+
+# Plotly Express is only imported once there are scored rows to chart
+import plotly.express as px
+
+since = pd.to_datetime(window['since'], unit='s').strftime('%Y-%m-%d %H:%M:%S')
+st.caption(f"Window: the last {window['size']:,} scored rows, since {since} UTC.")
+if window['size'] < MIN_ROWS:
+    st.warning(f"Fewer than {MIN_ROWS} rows in the window; PSI and KS are noisy at this size.")
+
+with span("monitoring.report"):
+    report = MONITOR.report().sort_values('psi', ascending=False)
+
+st.subheader("Drift by Feature")
+st.caption("PSI: < 0.1 stable, 0.1-0.25 moderate, ≥ 0.25 major shift. "
+           "KS: largest gap between the cumulative distributions; flagged above the 5% critical value.")
+n_major = int((report['level'] == 'major').sum())
+n_ks = int(report['ks_drift'].sum())
+st.write(f"**{n_major}** features with a major PSI shift, **{n_ks}** with a significant KS statistic.")
+
+fig = px.bar(report, x='psi', y='feature', orientation='h', color='level',
+             color_discrete_map=LEVEL_COLORS, title='Population Stability Index per Feature')
+fig.add_vline(x=0.1, line_dash='dot', line_color='orange')
+fig.add_vline(x=0.25, line_dash='dot', line_color='red')
+fig.update_layout(yaxis={'categoryorder': 'total ascending'}, height=700, xaxis_title='PSI', yaxis_title='')
+st.plotly_chart(fig, use_container_width=True)
+
+st.dataframe(
+    report[['feature', 'kind', 'n', 'psi', 'level', 'ks', 'ks_critical', 'ks_drift']].style.format(
+        {'psi': '{:.4f}', 'ks': '{:.4f}', 'ks_critical': '{:.4f}'}, na_rep='—'
+    ),
+    use_container_width=True, hide_index=True
+)
+
+st.subheader("Reference vs Window")
+feature = st.selectbox("Feature", report['feature'].tolist(), format_func=lambda c: c.replace('_', ' '))
+shares = MONITOR.compare(feature).melt(id_vars='bin', var_name='source', value_name='share')
+shares['share'] *= 100
+fig = px.bar(shares, x='bin', y='share', color='source', barmode='group',
+             color_discrete_map={'reference': 'lightgray', 'window': 'steelblue'},
+             title=f"{feature.replace('_', ' ').title()}: Share of Patients per Bin")
+numeric = report.set_index('feature').loc[feature, 'kind'] == 'numeric'
+fig.update_layout(xaxis_title='Bin (reference deciles)' if numeric else 'Category',
+                  yaxis_title='Patients (%)', legend_title_text='')
+st.plotly_chart(fig, use_container_width=True)
+
+with st.expander("Scored rows in the window"):
+    recent = MONITOR.recent()
+    st.dataframe(recent.tail(100).iloc[::-1], use_container_width=True, hide_index=True)
+    st.download_button("Download window as CSV", recent.to_csv(index=False).encode(),
+                       file_name="drift_window.csv", mime="text/csv")
+
+debug_panel()